@@ -4,20 +4,47 @@ Bulk Postgres upsert and update functions:
 - Use [pgbulk.upsert][] to do an `INSERT ON CONFLICT` statement.
 - Use [pgbulk.update][] to do a bulk `UPDATE` statement.
 - Use [pgbulk.copy][] to do a `COPY FROM` statement.
+- Use [pgbulk.parallel_copy][] to do `COPY FROM` statements over multiple connections.
 - Use [pgbulk.aupsert][], [pgbulk.aupdate][], or [pgbulk.acopy][] for async versions.
+- Use [pgbulk.aconnect][] to run async versions natively with psycopg3.
+- Use [pgbulk.BulkWriter][] to buffer model objects and write them in bulk, or
+  [pgbulk.BackgroundBulkWriter][] to write them in a background thread.
 """
 
-from pgbulk.core import UpdateField, UpsertResult, acopy, aupdate, aupsert, copy, update, upsert
+from pgbulk.core import (
+    BackgroundBulkWriter,
+    BulkWriter,
+    UpdateField,
+    UpsertColumnsResult,
+    UpsertResult,
+    UpsertStats,
+    aconnect,
+    acopy,
+    aupdate,
+    aupsert,
+    clear_plan_cache,
+    copy,
+    parallel_copy,
+    update,
+    upsert,
+)
 from pgbulk.version import __version__
 
 __all__ = [
+    "aconnect",
     "acopy",
     "update",
     "aupdate",
     "copy",
+    "parallel_copy",
     "upsert",
     "aupsert",
+    "clear_plan_cache",
     "UpsertResult",
+    "UpsertColumnsResult",
+    "UpsertStats",
     "UpdateField",
+    "BulkWriter",
+    "BackgroundBulkWriter",
     "__version__",
 ]
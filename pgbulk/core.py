@@ -1,12 +1,31 @@
+import contextlib
+import datetime as dt
+import functools
+import inspect
 import itertools
+import operator
+import queue
 import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from typing import (
     TYPE_CHECKING,
     Any,
+    AsyncGenerator,
+    Callable,
+    Dict,
+    Generator,
+    Generic,
     Iterable,
+    Iterator,
     List,
     Literal,
+    Mapping,
     NamedTuple,
+    Sequence,
+    Set,
     Tuple,
     Type,
     TypeVar,
@@ -18,8 +37,9 @@ from typing import (
 from asgiref.sync import sync_to_async
 from django import __version__ as DJANGO_VERSION
 from django.core.exceptions import ImproperlyConfigured
-from django.db import connections, models
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
 from django.db.models import expressions
+from django.db.models.signals import post_migrate
 from django.db.models.sql.compiler import SQLCompiler
 from django.utils import timezone
 from django.utils.version import get_version_tuple
@@ -29,12 +49,71 @@ UpdateFieldsTypeDef: TypeAlias = Union[
     List[str], List["UpdateField"], List[Union["UpdateField", str]], None
 ]
 _M = TypeVar("_M", bound=models.Model)
+_P = TypeVar("_P")
+_T = TypeVar("_T")
 QuerySet: TypeAlias = Union[Type[_M], models.QuerySet[_M]]
+ModelObjsTypeDef: TypeAlias = Union[
+    Iterable[_M],
+    Iterable[Mapping[str, Any]],
+    Iterable[Sequence[Any]],
+    Mapping[str, Sequence[Any]],
+]
 AnyField: TypeAlias = "models.Field[Any, Any]"
 Expression: TypeAlias = "models.Expression | models.F"
+WriteMethodTypeDef: TypeAlias = Literal["values", "unnest", "copy"]
+ReturningFormatTypeDef: TypeAlias = Literal["rows", "tuples", "columns", "numpy"]
+DuplicatesTypeDef: TypeAlias = Union[Literal["first", "last"], Callable[[Any, Any], Any], None]
 
 _PRECISION_SPECIFIER_RE: "Final" = re.compile(r"\(.*?\)")
 
+# Fields whose values of the exact type of these samples are converted without
+# validation. Subclasses may convert values differently, so only these field
+# classes use fast conversion.
+_FAST_FIELD_SAMPLES: Final[Dict[type, Any]] = {
+    models.AutoField: 0,
+    models.BigAutoField: 0,
+    models.SmallAutoField: 0,
+    models.IntegerField: 0,
+    models.BigIntegerField: 0,
+    models.SmallIntegerField: 0,
+    models.PositiveIntegerField: 0,
+    models.PositiveBigIntegerField: 0,
+    models.PositiveSmallIntegerField: 0,
+    models.BooleanField: False,
+    models.FloatField: 0.0,
+    models.CharField: "",
+    models.TextField: "",
+    models.UUIDField: uuid.UUID(int=0),
+}
+
+# Postgres refuses statements with more bind parameters than this
+_MAX_QUERY_PARAMS: "Final" = 65535
+
+# The number of model objects sent to a parallel copy worker at a time, and
+# the number of these chunks that can be queued for each worker
+_PARALLEL_COPY_CHUNK_SIZE: "Final" = 1000
+_PARALLEL_COPY_QUEUE_SIZE: "Final" = 4
+
+# The number of returned rows converted at a time when streaming results
+_STREAM_CHUNK_SIZE: "Final" = 1000
+
+# The number of rows in each streamed statement when no batch size is given,
+# since the rows returned by a statement are received all at once
+_STREAM_BATCH_SIZE: "Final" = 1000
+
+# The number of model objects that primary keys are allocated for at a time
+# when copying with set_pks
+_SET_PKS_WINDOW_SIZE: "Final" = 10000
+
+# How often, in seconds, callers blocked on the background thread of a writer
+# check that the thread is still running
+_BACKGROUND_POLL_INTERVAL: "Final" = 0.1
+
+# The maximum number of write plans that are cached
+_PLAN_CACHE_SIZE: "Final" = 1024
+_plans: Final[Dict[Tuple[Any, ...], Any]] = {}
+_plans_lock: "Final" = threading.Lock()
+
 
 class _DB_DEFAULT:
     """Sentinel value for a database default."""
@@ -43,11 +122,12 @@ class _DB_DEFAULT:
 if TYPE_CHECKING:
     from django.db import DefaultConnectionProxy
     from django.db.backends.utils import CursorWrapper
+    from psycopg import AsyncConnection
 
     class Row(NamedTuple):
         """Represents a row returned by an upsert operation."""
 
-        status_: Literal["u", "c"]
+        status_: Literal["u", "c", "n"]
 
         def __getattr__(self, item: str) -> Any: ...
 
@@ -74,8 +154,13 @@ psycopg_maj_version = psycopg_version[0]
 
 
 if psycopg_maj_version == 2:
+    from psycopg2.extensions import AsIs as LiteralValue  # type: ignore
     from psycopg2.extensions import quote_ident  # type: ignore
+
+    # Features that need psycopg3 check the version before using the module
+    psycopg: Any = None
 elif psycopg_maj_version == 3:
+    import psycopg  # type: ignore
     import psycopg.adapt  # type: ignore
     from psycopg.pq import Escaping  # type: ignore
 
@@ -130,7 +215,7 @@ class UpsertResult(List["Row"]):
     Returned by [pgbulk.upsert][] when the `returning` argument is provided.
 
     Wraps a list of named tuples where the names correspond to the underlying
-    Django model attribute names.
+    Django model attribute names, or plain tuples when `returning_format="tuples"`.
 
     Also provides properties to access created and updated rows.
     """
@@ -138,12 +223,66 @@ class UpsertResult(List["Row"]):
     @property
     def created(self) -> List["Row"]:
         """Return the created rows"""
-        return [i for i in self if i.status_ == "c"]
+        return [i for i in self if i[-1] == "c"]
 
     @property
     def updated(self) -> List["Row"]:
         """Return the updated rows"""
-        return [i for i in self if i.status_ == "u"]
+        return [i for i in self if i[-1] == "u"]
+
+    @property
+    def unchanged(self) -> List["Row"]:
+        """Return the unchanged rows when upserting with `return_unchanged=True`"""
+        return [i for i in self if i[-1] == "n"]
+
+
+class UpsertStats(NamedTuple):
+    """
+    Returned by [pgbulk.upsert][] when the `stats` argument is provided.
+
+    Counts the rows that were created, updated, and left unchanged. Rows are
+    unchanged when they conflict and are not updated, such as when
+    `ignore_unchanged=True` or when there are no fields to update.
+    """
+
+    created: int
+    updated: int
+    unchanged: int
+
+
+class UpsertColumnsResult(Dict[str, Any]):
+    """
+    Returned by [pgbulk.upsert][] when the `returning` argument is provided
+    with `returning_format="columns"` or `returning_format="numpy"`.
+
+    Maps the names of the returned columns to lists or NumPy arrays of their
+    values. The `status_` column is `"c"` for created rows and `"u"` for
+    updated rows.
+
+    Also provides properties to access masks of created and updated rows.
+    """
+
+    def _mask(self, status: str) -> Any:
+        statuses = self["status_"]
+        if isinstance(statuses, list):
+            return [row_status == status for row_status in cast(List[str], statuses)]
+        else:
+            return statuses == status
+
+    @property
+    def created(self) -> Any:
+        """Return a mask of the created rows"""
+        return self._mask("c")
+
+    @property
+    def updated(self) -> Any:
+        """Return a mask of the updated rows"""
+        return self._mask("u")
+
+    @property
+    def unchanged(self) -> Any:
+        """Return a mask of the unchanged rows when upserting with `return_unchanged=True`"""
+        return self._mask("n")
 
 
 def _quote(field: str, cursor: "CursorWrapper") -> str:
@@ -200,11 +339,14 @@ def _filter_fields(
     return to_update
 
 
-def _fill_auto_fields(queryset: models.QuerySet[_M], values: Iterable[_M]) -> Iterable[_M]:
+def _fill_auto_fields(queryset: models.QuerySet[_M], values: Iterable[_M]) -> Iterator[_M]:
     """
     Given a list of models, fill in auto_now and auto_now_add fields
     for upserts. Since django manager utils passes Django's ORM, these values
-    have to be automatically constructed
+    have to be automatically constructed.
+
+    Models are filled lazily as they are consumed so that iterators are not
+    exhausted before they are written.
     """
     model = queryset.model
     auto_field_names = [
@@ -217,29 +359,133 @@ def _fill_auto_fields(queryset: models.QuerySet[_M], values: Iterable[_M]) -> It
         for f in auto_field_names:
             setattr(value, f, now)
 
-    return values
+        yield value
+
+
+class _Rows(NamedTuple):
+    """The layout of rows of values that are written instead of model objects."""
 
+    # The attnames of the values in each row
+    columns: Tuple[str, ...]
+    # The keys of the values in each row, which are positions unless rows are mappings
+    keys: Tuple[Any, ...]
+    # The value of auto_now and auto_now_add fields. If None, values in rows are used
+    now: Union[dt.datetime, None]
 
-def _prep_sql_args(
+
+def _get_rows(
     queryset: models.QuerySet[_M],
-    cursor: "CursorWrapper",
-    sql_args: List[Any],
-) -> List[Any]:
+    model_objs: ModelObjsTypeDef[_M],
+    columns: Union[List[str], None],
+    *,
+    fill_auto_fields: bool,
+) -> Tuple[Iterable[Any], Union[_Rows, None]]:
+    """
+    Return the model objects or rows of values to write, along with the layout
+    of the rows. The layout is `None` for model objects.
+
+    Mappings are read with the keys of the first mapping, and mappings of columns
+    are converted to tuples of their values.
+    """
+    model = queryset.model
+    now = timezone.now() if fill_auto_fields else None
+    if isinstance(model_objs, Mapping):
+        if columns is not None:
+            raise ValueError("columns cannot be provided with a mapping of columns.")
+
+        columns_of_values = cast(Mapping[str, Sequence[Any]], model_objs)
+        if len({len(values) for values in columns_of_values.values()}) > 1:
+            raise ValueError("Columns must have the same number of values.")
+
+        names = list(columns_of_values)
+        return zip(*columns_of_values.values()), _Rows(
+            _get_attnames(model, names), tuple(range(len(names))), now
+        )
+
+    objs: Iterator[Any] = iter(model_objs)
+    first: Any = next(objs, None)
+    if first is None:
+        return [], None
+
+    objs = itertools.chain([first], objs)
+    if isinstance(first, models.Model):
+        if columns is not None:
+            raise ValueError("columns cannot be provided with model objects.")
+
+        return (_fill_auto_fields(queryset, objs) if fill_auto_fields else objs), None
+    elif isinstance(first, Mapping):
+        if columns is not None:
+            raise ValueError("columns cannot be provided with mappings.")
+
+        columns = list(cast(Mapping[str, Any], first))
+        return objs, _Rows(_get_attnames(model, columns), tuple(columns), now)
+    elif columns is None:
+        raise ValueError("columns must be provided with rows of values.")
+
+    return _check_row_widths(objs, len(columns)), _Rows(
+        _get_attnames(model, columns), tuple(range(len(columns))), now
+    )
+
+
+def _check_row_widths(rows: Iterable[Sequence[Any]], num_columns: int) -> Iterator[Sequence[Any]]:
+    """Check that rows of values have a value for every column as they are consumed."""
+    for row in rows:
+        if len(row) != num_columns:
+            raise ValueError(f"Rows must have {num_columns} values, one for each column.")
+
+        yield row
+
+
+def _get_attnames(model: Type[models.Model], names: List[str]) -> Tuple[str, ...]:
+    """Return the attnames of the named fields of a model."""
+    return tuple(model._meta.get_field(name).attname for name in names)  # type: ignore
+
+
+def _windows(model_objs: Iterable[_T], window_size: Union[int, None]) -> Iterator[List[_T]]:
+    """
+    Pull model objects from an iterable in windows of `window_size`.
+
+    If `window_size` is `None`, all model objects are returned in one window.
+    Empty windows are never returned.
+    """
+    if window_size is not None and window_size < 1:
+        raise ValueError("window_size must be a positive integer.")
+
+    model_objs = iter(model_objs)
+    while window := list(itertools.islice(model_objs, window_size)):
+        yield window
+
+
+def _get_expression_renderer(
+    queryset: models.QuerySet[_M], cursor: "CursorWrapper"
+) -> Callable[[List[List[Any]], Set[int]], None]:
+    """
+    Return a function that renders the expressions of rows into SQL literals in
+    place. Only the values at the given positions, which are found when rows are
+    extracted, are checked.
+
+    The compiler and the dumper of literals are set up once for the cursor of a
+    write rather than for every batch.
+    """
     if psycopg_maj_version == 3:
         cursor.adapters.register_dumper(LiteralValue, LiteralDumper)  # type: ignore
 
-    compiler = SQLCompiler(
-        query=queryset.query,
-        connection=cursor.connection,
-        using=queryset.using,  # type: ignore
-    )
+    connection = connections[queryset.db]
+    compiler = SQLCompiler(query=queryset.query, connection=connection, using=queryset.db)
 
-    return [
-        LiteralValue(cursor.mogrify(*sql_arg.as_sql(compiler, cursor.connection)).decode("utf-8"))
-        if hasattr(sql_arg, "as_sql")
-        else sql_arg
-        for sql_arg in sql_args
-    ]
+    def render_expressions(rows: List[List[Any]], positions: Set[int]) -> None:
+        for row in rows:
+            for i in positions:
+                if hasattr(row[i], "as_sql"):
+                    sql = cast(
+                        Union[str, bytes], cursor.mogrify(*row[i].as_sql(compiler, connection))
+                    )
+                    if isinstance(sql, bytes):  # Psycopg 2/3 return different types
+                        sql = sql.decode("utf-8")
+
+                    row[i] = LiteralValue(f"({sql})")
+
+    return render_expressions
 
 
 def _value_is_db_default(value: Any) -> bool:
@@ -274,97 +520,609 @@ def _get_field_db_val(
         return field.get_db_prep_save(value, connection)
 
 
-def _sort_by_unique_fields(
-    queryset: models.QuerySet[_M],
-    model_objs: Iterable[_M],
-    unique_fields: List[str],
-) -> List[_M]:
+def _tuple_getter(
+    make_getter: Callable[..., Callable[[Any], Any]], items: Sequence[Any]
+) -> Callable[[Any], Tuple[Any, ...]]:
+    """
+    Make an `operator.attrgetter` or `operator.itemgetter` that always
+    returns a tuple, even for one item.
     """
-    Sort a list of models by their unique fields.
+    getter = make_getter(*items)
+    if len(items) == 1:
+        return lambda obj: (getter(obj),)
+
+    return getter
+
+
+@functools.lru_cache(maxsize=_PLAN_CACHE_SIZE)
+def _compile_row_getter(fields: Tuple[AnyField, ...]) -> Callable[[Any], Tuple[Any, ...]]:
+    """Return a function that gets the values of the fields from a model object."""
+    # Use attname here to support fields with custom db_column names
+    return _tuple_getter(operator.attrgetter, [field.attname for field in fields])
+
+
+def _get_row_getter(
+    fields: List[AnyField], layout: Union[_Rows, None]
+) -> Callable[[Any], Tuple[Any, ...]]:
+    """Return a function that gets the values of the fields from a model object or row."""
+    if layout is None:
+        return _compile_row_getter(tuple(fields))
+
+    keys = dict(zip(layout.columns, layout.keys))
+    getters: List[Callable[[Any], Any]] = []
+    for field in fields:
+        if layout.now is not None and (
+            getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+        ):
+            getters.append(lambda row, now=layout.now: now)
+        elif field.attname in keys:
+            getters.append(operator.itemgetter(keys[field.attname]))
+        else:
+            # Like new model objects, fields that are not in rows use their defaults
+            getters.append(lambda row, field=field: field.get_default())
+
+    if all(isinstance(getter, operator.itemgetter) for getter in getters):
+        return _tuple_getter(operator.itemgetter, [keys[field.attname] for field in fields])
+
+    return lambda row: tuple(getter(row) for getter in getters)
+
 
-    Sorting models in an upsert greatly reduces the chances of deadlock
-    when doing concurrent upserts
+def _get_fast_converter(
+    field: AnyField, connection: "DefaultConnectionProxy"
+) -> Tuple[Union[Type[Any], None], Union[Type[Any], None]]:
     """
-    model = queryset.model
-    connection = connections[queryset.db]
-    unique_db_fields = [field for field in _model_fields(model) if field.attname in unique_fields]
+    Return the type of values that can be converted quickly for a field, along
+    with the type that wraps them. `None` is returned for the wrapping type if
+    values are saved unchanged, and for both if the field has no fast conversion.
 
-    def sort_key(model_obj: _M) -> Tuple[Any, ...]:
-        return tuple(
-            _get_field_db_val(queryset, field, getattr(model_obj, field.attname), connection)
-            for field in unique_db_fields
-        )
+    The conversion is found by saving a sample value. For example, integers
+    are wrapped in a type with the size of the column on psycopg3.
+    """
+    try:
+        sample = _FAST_FIELD_SAMPLES[type(field)]
+    except KeyError:
+        return None, None
 
-    return sorted(model_objs, key=sort_key)
+    fast_type = cast(Type[Any], type(sample))
+    converted = field.get_db_prep_save(sample, connection)
+    if type(converted) is fast_type and converted == sample:
+        return fast_type, None
+    elif isinstance(converted, fast_type) and converted == sample:
+        return fast_type, cast(Type[Any], type(converted))
+    else:  # pragma: no cover
+        return None, None
 
 
-def _get_values_for_row(
+def _get_row_extractor(
     queryset: models.QuerySet[_M],
-    model_obj: _M,
-    all_fields: List[AnyField],
+    fields: List[AnyField],
     *,
     copying: bool = False,
-) -> List[Any]:
+    layout: Union[_Rows, None] = None,
+    expression_positions: Union[Set[int], None] = None,
+) -> Callable[[_M], List[Any]]:
+    """
+    Return a function that converts a model object, or a row of values described
+    by `layout`, to a row of database values.
+
+    Values of plain fields that are `None` or exactly the type the field saves
+    skip the validation and expression checks of `get_db_prep_save`. The
+    positions of values that are expressions are added to `expression_positions`
+    so that rows without expressions can be sent unchanged.
+    """
     connection = connections[queryset.db]
-    return [
-        # Convert field value to db value
-        # Use attname here to support fields with custom db_column names
-        _get_field_db_val(
-            queryset, field, getattr(model_obj, field.attname), connection, copying=copying
-        )
-        for field in all_fields
+    getter = _get_row_getter(fields, layout)
+    converters = [
+        (i, field, *_get_fast_converter(field, connection)) for i, field in enumerate(fields)
     ]
 
+    def extract_row(model_obj: _M) -> List[Any]:
+        row: List[Any] = []
+        for (i, field, fast_type, wrap), value in zip(converters, getter(model_obj)):
+            if fast_type is None or (value is not None and type(value) is not fast_type):
+                value = _get_field_db_val(queryset, field, value, connection, copying=copying)
+                if expression_positions is not None and hasattr(value, "as_sql"):
+                    expression_positions.add(i)
+            elif wrap is not None and value is not None:
+                value = wrap(value)
+
+            row.append(value)
+
+        return row
+
+    return extract_row
+
 
 def _format_placeholders_row(
     values_for_row: List[Any],
-    all_fields: List[AnyField],
-    connection: "DefaultConnectionProxy",
+    db_types: List[str],
     *,
     include_cast: bool,
 ) -> str:
     placeholders = ", ".join(
-        f"{'%s'}{f'::{field.db_type(connection)}' if include_cast else ''}"
-        if val is not _DB_DEFAULT
-        else "DEFAULT"
-        for val, field in zip(values_for_row, all_fields)
+        f"{'%s'}{f'::{db_type}' if include_cast else ''}" if val is not _DB_DEFAULT else "DEFAULT"
+        for val, db_type in zip(values_for_row, db_types)
     )
     return f"({placeholders})"
 
 
-def _get_values_for_rows(
-    queryset: models.QuerySet[_M],
-    model_objs: Iterable[_M],
-    all_fields: List[AnyField],
+def _get_placeholders_for_rows(
+    rows: Iterable[List[Any]],
+    db_types: List[str],
 ) -> Tuple[List[str], List[Any]]:
-    connection = connections[queryset.db]
     row_values: List[str] = []
     sql_args: List[Any] = []
 
-    for i, model_obj in enumerate(model_objs):
-        values_for_row = _get_values_for_row(queryset, model_obj, all_fields)
+    for i, values_for_row in enumerate(rows):
         sql_args.extend((val for val in values_for_row if val is not _DB_DEFAULT))
         if i == 0:
             row_values.append(
-                _format_placeholders_row(values_for_row, all_fields, connection, include_cast=True)
+                _format_placeholders_row(values_for_row, db_types, include_cast=True)
             )
         else:
             row_values.append(
-                _format_placeholders_row(
-                    values_for_row, all_fields, connection, include_cast=False
-                )
+                _format_placeholders_row(values_for_row, db_types, include_cast=False)
             )
 
     return row_values, sql_args
 
 
+def _get_unnest_sql(all_fields: List[AnyField], db_types: List[str]) -> str:
+    """
+    Render an unnest() call that expands one typed array parameter per field
+    into rows. The SQL is the same regardless of the number of rows.
+    """
+    for field, db_type in zip(all_fields, db_types):
+        if db_type.endswith("]"):
+            raise ValueError(f'Array field "{field.name}" is not supported with method="unnest".')
+
+    return "unnest({0})".format(", ".join(f"%s::{db_type}[]" for db_type in db_types))
+
+
+def _get_columns_for_rows(rows: List[List[Any]], *, method: WriteMethodTypeDef) -> List[Any]:
+    """Transpose rows of values into one list of values for every column."""
+    columns = [list(column) for column in zip(*rows)]
+    if any(val is _DB_DEFAULT for column in columns for val in column):
+        raise ValueError(f'DB defaults are not supported with method="{method}".')
+
+    return columns
+
+
+def _estimate_row_size(values_for_row: List[Any]) -> int:
+    """Estimate the number of bytes a row of values adds to a statement."""
+    return sum(
+        len(val) if isinstance(val, (str, bytes)) else len(str(val))
+        for val in values_for_row
+        if val is not None and val is not _DB_DEFAULT
+    )
+
+
+def _batch_rows(
+    rows: Iterable[List[Any]],
+    *,
+    batch_size: Union[int, None],
+    batch_bytes: Union[int, None],
+    max_params: Union[int, None] = _MAX_QUERY_PARAMS,
+) -> Iterator[List[List[Any]]]:
+    """
+    Split rows of values into batches for separate statements.
+
+    Batches are bounded by `batch_size` rows, an estimated `batch_bytes` bytes
+    of values, and `max_params` query parameters. A batch always has at least
+    one row.
+    """
+    if batch_size is not None and batch_size < 1:
+        raise ValueError("batch_size must be a positive integer.")
+    if batch_bytes is not None and batch_bytes < 1:
+        raise ValueError("batch_bytes must be a positive integer.")
+
+    batch: List[List[Any]] = []
+    num_params = 0
+    num_bytes = 0
+    for values_for_row in rows:
+        row_bytes = _estimate_row_size(values_for_row) if batch_bytes else 0
+        if batch and (
+            (batch_size and len(batch) >= batch_size)
+            or (max_params and num_params + len(values_for_row) > max_params)
+            or (batch_bytes and num_bytes + row_bytes > batch_bytes)
+        ):
+            yield batch
+            batch, num_params, num_bytes = [], 0, 0
+
+        batch.append(values_for_row)
+        num_params += len(values_for_row)
+        num_bytes += row_bytes
+
+    if batch:
+        yield batch
+
+
+def _bucket_batches(batches: Iterable[List[List[Any]]]) -> Iterator[List[List[Any]]]:
+    """
+    Split batches of rows into batches with a power of two rows. Statements that
+    render every row then have few distinct shapes, which can be prepared once.
+    """
+    for batch in batches:
+        start = 0
+        while start < len(batch):
+            size = 1 << ((len(batch) - start).bit_length() - 1)
+            yield batch[start : start + size]
+            start += size
+
+
+def _check_pipeline(pipeline: bool) -> None:
+    if pipeline and psycopg_maj_version == 2:  # pragma: no cover
+        raise RuntimeError("Only psycopg3 is supported for pipeline=True.")
+
+
+def _check_prepare(prepare: bool, cursor: Any) -> None:
+    if not prepare:
+        return
+
+    if psycopg_maj_version == 2:  # pragma: no cover
+        raise RuntimeError("Only psycopg3 is supported for prepare=True.")
+
+    # Django disables prepared statements unless they are enabled in the database options
+    if cursor.connection.prepare_threshold is None:
+        raise ImproperlyConfigured(
+            'Set the "prepare_threshold" option of the database to use prepare=True.'
+        )
+
+
+@functools.lru_cache(maxsize=_PLAN_CACHE_SIZE)
+def _get_row_type(names: Tuple[str, ...]) -> Type[Tuple[Any, ...]]:
+    """Return the named tuple type of rows with the columns `names`."""
+    fields: List[Tuple[str, Any]] = [(name, Any) for name in names]
+    return NamedTuple("Result", fields)
+
+
+def _get_row_maker(
+    description: Any, returning_format: ReturningFormatTypeDef
+) -> Callable[[Tuple[Any, ...]], "Row"]:
+    """Return a function that makes a row from a record returned by a statement."""
+    if returning_format == "tuples":
+        return tuple  # type: ignore
+
+    # Records have as many values as there are columns, so the named tuple
+    # can be created directly without checking its arguments
+    row_type = _get_row_type(tuple(col.name for col in description))
+    return functools.partial(tuple.__new__, row_type)  # type: ignore
+
+
+def _make_rows(
+    description: Any,
+    records: Iterable[Tuple[Any, ...]],
+    returning_format: ReturningFormatTypeDef = "rows",
+) -> List["Row"]:
+    """Make rows from the records returned by a statement."""
+    return list(map(_get_row_maker(description, returning_format), records))
+
+
+class _Returned:
+    """Collects the rows returned by the statements of a write in a format."""
+
+    def __init__(self, columns: List[str], returning_format: ReturningFormatTypeDef) -> None:
+        self.returning_format: ReturningFormatTypeDef = returning_format
+        self.columnar = returning_format in ("columns", "numpy")
+        self.rows: List["Row"] = []
+        self.columns: Dict[str, List[Any]] = {column: [] for column in columns}
+
+    @property
+    def statement_format(self) -> ReturningFormatTypeDef:
+        """The format of the rows returned by each statement."""
+        return "tuples" if self.columnar else self.returning_format
+
+    def extend(self, rows: List["Row"]) -> None:
+        if self.columnar:
+            for values, column_values in zip(self.columns.values(), zip(*rows)):
+                values.extend(column_values)
+        else:
+            self.rows.extend(rows)
+
+    def result(self) -> Union[List["Row"], Dict[str, Any]]:
+        if self.returning_format == "numpy":
+            return _to_numpy(self.columns)
+        elif self.returning_format == "columns":
+            return self.columns
+        else:
+            return self.rows
+
+
+def _get_returned_setter(
+    queryset: models.QuerySet[_M], returned_columns: List[str]
+) -> Callable[[Dict[int, _M], List["Row"]], None]:
+    """
+    Return a function that sets the values of returned rows onto the model
+    objects they were written from. Model objects are passed to the function
+    keyed by their position in the input, which rows return in `index_`.
+    """
+    model = queryset.model
+    connection = connections[queryset.db]
+    fields_by_column = {field.column: field for field in _model_fields(model)}
+    returned: List[Tuple[int, AnyField, Any, List[Any]]] = []
+    for i, column in enumerate(returned_columns):
+        if column in fields_by_column:
+            field = fields_by_column[column]
+            col = field.get_col(model._meta.db_table)
+            converters = connection.ops.get_db_converters(col) + col.get_db_converters(connection)
+            returned.append((i, field, col, converters))
+
+    index_position = returned_columns.index("index_")
+
+    def set_returned(objs_by_index: Dict[int, _M], rows: List["Row"]) -> None:
+        for row in rows:
+            obj = objs_by_index[cast(int, row[index_position])]
+            for i, field, col, converters in returned:
+                value = row[i]
+                for converter in converters:
+                    value = converter(value, col, connection)
+                setattr(obj, field.attname, value)
+
+            obj._state.adding = False  # pyright: ignore[reportPrivateUsage]
+            obj._state.db = queryset.db  # pyright: ignore[reportPrivateUsage]
+
+    return set_returned
+
+
+def _to_numpy(columns: Dict[str, List[Any]]) -> Dict[str, Any]:
+    """Convert lists of column values to NumPy arrays."""
+    try:
+        import numpy as np
+    except ImportError as exc:  # pragma: no cover
+        raise ImproperlyConfigured(
+            'NumPy must be installed for returning_format="numpy".'
+        ) from exc
+
+    return {column: np.array(values) for column, values in columns.items()}
+
+
+class _Execute(NamedTuple):
+    """
+    A statement for a writer to execute. The returned rows of streamed statements
+    are passed to the caller instead of being sent back to the writer. Statements
+    that are not streamed are prepared on the server if `prepare` is True.
+    """
+
+    sql: str
+    params: Union[List[Any], None] = None
+    stream: bool = False
+    returning_format: ReturningFormatTypeDef = "rows"
+    prepare: bool = False
+
+
+class _CopyRows(NamedTuple):
+    """Rows for a writer to copy with a COPY statement."""
+
+    sql: str
+    postgres_types: Union[List[str], None]
+    rows: Iterable[List[Any]]
+
+
+class _Pipeline(NamedTuple):
+    """
+    Statements for a writer to send together in psycopg3 pipeline mode. The rows
+    returned by every statement are sent back to the writer in a list.
+    """
+
+    statements: List[_Execute]
+
+
+# Writers yield the statements of an operation and are sent back the returned rows.
+# This allows the same operation to be run by a sync or an async cursor.
+_R = TypeVar("_R")
+_Writer: TypeAlias = Generator[Union[_Execute, _CopyRows, _Pipeline], Any, _R]
+
+
+def _pipeline_cursor(op: _Execute, connection: Any, cursor_class: Any) -> Any:
+    """
+    Make a cursor for a statement of a pipeline. Every statement has its own
+    cursor so that its results can be fetched after the pipeline is synced.
+    """
+    if op.prepare:
+        return cursor_class(connection)
+
+    # Client-side binding cursors render expressions like Django's cursors
+    client_cursor_class = (
+        psycopg.AsyncClientCursor if cursor_class is psycopg.AsyncCursor else psycopg.ClientCursor
+    )
+    pipeline_cursor = client_cursor_class(connection)
+    pipeline_cursor.adapters.register_dumper(LiteralValue, LiteralDumper)
+    return pipeline_cursor
+
+
+def _run_pipeline(op: _Pipeline, cursor: "CursorWrapper") -> List[List["Row"]]:
+    """Run the statements of a pipeline on the connection of a Django cursor."""
+    connection = cursor.connection
+    pipeline_cursors: List[Any] = []
+    with connection.pipeline():  # type: ignore
+        for statement in op.statements:
+            pipeline_cursor = _pipeline_cursor(statement, connection, psycopg.Cursor)
+            pipeline_cursor.execute(statement.sql, statement.params, prepare=statement.prepare)
+            pipeline_cursors.append(pipeline_cursor)
+
+    results: List[List["Row"]] = []
+    for statement, pipeline_cursor in zip(op.statements, pipeline_cursors):
+        with pipeline_cursor:
+            results.append(
+                _make_rows(
+                    pipeline_cursor.description,
+                    pipeline_cursor.fetchall(),
+                    statement.returning_format,
+                )
+                if pipeline_cursor.description
+                else []
+            )
+
+    return results
+
+
+def _run_op(op: Union[_Execute, _CopyRows, _Pipeline], cursor: "CursorWrapper") -> Any:
+    """Run a statement of a writer with a Django cursor."""
+    if isinstance(op, _Pipeline):
+        return _run_pipeline(op, cursor)
+    elif isinstance(op, _CopyRows):
+        with cursor.copy(op.sql) as copier:  # type: ignore
+            if op.postgres_types is not None:
+                copier.set_types(op.postgres_types)  # type: ignore
+
+            for row in op.rows:
+                copier.write_row(row)  # type: ignore
+
+        return []
+    elif op.prepare:
+        # Django's cursors bind parameters on the client and cannot prepare statements.
+        # Prepared statements are kept by psycopg in a bounded cache of the connection
+        with psycopg.Cursor(cursor.connection) as prepared_cursor:
+            prepared_cursor.execute(op.sql, op.params, prepare=True)
+            if not prepared_cursor.description:
+                return []
+
+            return _make_rows(
+                prepared_cursor.description, prepared_cursor.fetchall(), op.returning_format
+            )
+    else:
+        cursor.execute(op.sql, op.params)
+        if not cursor.description:
+            return []
+
+        return _make_rows(cursor.description, cursor.fetchall(), op.returning_format)
+
+
+def _run_writer(writer: "_Writer[_R]", cursor: "CursorWrapper") -> _R:
+    """Run a writer with a Django cursor."""
+    rows: Any = None
+    while True:
+        try:
+            op = writer.send(rows)
+        except StopIteration as exc:
+            return exc.value
+
+        rows = _run_op(op, cursor)
+
+
+def _stream_writer(writer: "_Writer[Any]", cursor: "CursorWrapper") -> Iterator["Row"]:
+    """
+    Run a writer with a Django cursor, yielding the rows returned by streamed
+    statements as they are fetched.
+    """
+    rows: Any = None
+    while True:
+        try:
+            op = writer.send(rows)
+        except StopIteration:
+            return
+
+        if isinstance(op, _Execute) and op.stream:
+            # The result of each statement is received before its rows are yielded so
+            # that the connection can be used while iterating. Rows are converted in
+            # chunks rather than all at once
+            cursor.execute(op.sql, op.params)
+            make_row = _get_row_maker(cursor.description, op.returning_format)
+            while records := cursor.fetchmany(_STREAM_CHUNK_SIZE):
+                yield from map(make_row, records)
+
+            rows = []
+        else:
+            rows = _run_op(op, cursor)
+
+
+def _stream_writes(
+    queryset: models.QuerySet[_M], make_writer: Callable[..., "_Writer[Any]"]
+) -> Iterator["Row"]:
+    """Run a writer in a transaction as the returned rows are consumed."""
+    with transaction.atomic(using=queryset.db, savepoint=False):
+        with connections[queryset.db].cursor() as cursor:
+            yield from _stream_writer(make_writer(cursor=cursor), cursor)
+
+
+async def _arun_writer(writer: "_Writer[_R]", cursor: Any) -> _R:
+    """Run a writer with a psycopg3 async cursor."""
+    rows: Any = None
+    while True:
+        try:
+            op = writer.send(rows)
+        except StopIteration as exc:
+            return exc.value
+
+        if isinstance(op, _CopyRows):
+            async with cursor.copy(op.sql) as copier:
+                if op.postgres_types is not None:
+                    copier.set_types(op.postgres_types)
+
+                for row in op.rows:
+                    await copier.write_row(row)
+
+            rows = []
+        elif isinstance(op, _Pipeline):
+            pipeline_cursors: List[Any] = []
+            async with cursor.connection.pipeline():
+                for statement in op.statements:
+                    pipeline_cursor = _pipeline_cursor(
+                        statement, cursor.connection, psycopg.AsyncCursor
+                    )
+                    await pipeline_cursor.execute(
+                        statement.sql, statement.params, prepare=statement.prepare
+                    )
+                    pipeline_cursors.append(pipeline_cursor)
+
+            rows = []
+            for statement, pipeline_cursor in zip(op.statements, pipeline_cursors):
+                async with pipeline_cursor:
+                    rows.append(
+                        _make_rows(
+                            pipeline_cursor.description,
+                            await pipeline_cursor.fetchall(),
+                            statement.returning_format,
+                        )
+                        if pipeline_cursor.description
+                        else []
+                    )
+        elif op.prepare:
+            async with psycopg.AsyncCursor(cursor.connection) as prepared_cursor:
+                await prepared_cursor.execute(op.sql, op.params, prepare=True)
+                rows = (
+                    _make_rows(
+                        prepared_cursor.description,
+                        await prepared_cursor.fetchall(),
+                        op.returning_format,
+                    )
+                    if prepared_cursor.description
+                    else []
+                )
+        else:
+            await cursor.execute(op.sql, op.params)
+            rows = (
+                _make_rows(cursor.description, await cursor.fetchall(), op.returning_format)
+                if cursor.description
+                else []
+            )
+
+
+def _get_returning_fields(
+    returning: Union[List[str], bool],
+    model: Type[models.Model],
+    include_status: bool,
+    include_index: bool = False,
+) -> List[str]:
+    """Return the names of the columns returned by a write."""
+    returning = returning if returning is not True else [f.column for f in _model_fields(model)]
+    if not returning:
+        return []
+
+    return [
+        *returning,
+        *(["index_"] if include_index else []),
+        *(["status_"] if include_status else []),
+    ]
+
+
 def _get_returning_sql(
     returning: Union[List[str], bool],
     model: Type[models.Model],
     cursor: "CursorWrapper",
     include_status: bool,
 ) -> str:
-    returning = returning if returning is not True else [f.column for f in _model_fields(model)]
+    returning = _get_returning_fields(returning, model, include_status=False)
     if not returning:
         return ""
 
@@ -376,6 +1134,7 @@ def _get_returning_sql(
     return "RETURNING " + returning_sql
 
 
+@functools.lru_cache(maxsize=None)
 def _model_fields(model: Type[models.Model]) -> List["models.Field[Any, Any]"]:
     """Return the fields of a model, excluding generated and non-concrete ones."""
     return [f for f in model._meta.fields if not getattr(f, "generated", False) and f.concrete]
@@ -400,16 +1159,14 @@ def _get_update_fields_sql(
     }
     update_fields_expressions = {col: f"{alias}.{_quote(col, cursor)}" for col in cols}
     if update_expressions:
-        connection = connections[queryset.db]
         compiler = SQLCompiler(query=queryset.query, connection=connection, using=queryset.using)  # type: ignore
-        with connection.cursor() as cursor:
-            for field_name, expr in update_expressions.items():
-                expr = expr.resolve_expression(queryset.query, allow_joins=False, for_save=True)
-                val = cursor.mogrify(*expr.as_sql(compiler, connection))  #  type: ignore
-                val = cast(Union[str, bytes], val)
-                if isinstance(val, bytes):  # Psycopg 2/3 return different types
-                    val = val.decode("utf-8")
-                update_fields_expressions[model._meta.get_field(field_name).column] = val
+        for field_name, expr in update_expressions.items():
+            expr = expr.resolve_expression(queryset.query, allow_joins=False, for_save=True)
+            val = cursor.mogrify(*expr.as_sql(compiler, connection))  #  type: ignore
+            val = cast(Union[str, bytes], val)
+            if isinstance(val, bytes):  # Psycopg 2/3 return different types
+                val = val.decode("utf-8")
+            update_fields_expressions[model._meta.get_field(field_name).column] = val
 
     set_sql = ", ".join(
         f"{_quote(col, cursor)} = {update_fields_expressions[col]}" for col in cols
@@ -427,29 +1184,42 @@ def _get_update_fields_sql(
     return set_sql, ignore_unchanged_sql
 
 
+def _get_upsert_fields(model: Type[models.Model], unique_fields: List[str]) -> List[AnyField]:
+    """Use all fields except auto fields unless in the uniqueness constraint."""
+    return [
+        field
+        for field in _model_fields(model)
+        if field.column in unique_fields or not isinstance(field, models.AutoField)
+    ]
+
+
 def _get_upsert_sql(
     queryset: models.QuerySet[_M],
-    model_objs: Iterable[_M],
+    all_fields: List[AnyField],
     unique_fields: List[str],
     update_fields: List[Union[str, UpdateField]],
     returning: Union[List[str], bool],
     ignore_unchanged: bool,
+    return_unchanged: bool,
+    ordered: bool,
+    stats: bool,
     cursor: "CursorWrapper",
-) -> Tuple[str, List[Any]]:
+) -> Tuple[str, str]:
     """
     Generates the postgres specific sql necessary to perform an upsert
     (ON CONFLICT) INSERT INTO table_name (field1, field2)
     VALUES (1, 'two')
     ON CONFLICT (unique_field) DO UPDATE SET field2 = EXCLUDED.field2;
+
+    The SQL before and after the inserted rows is returned so that it can be
+    rendered once and shared by every batch of rows. If `stats` is True, the
+    upsert is wrapped in a statement that counts the created and updated rows.
+    If `return_unchanged` or `ordered` is True, the rows are selected from a CTE
+    so that existing rows which match them and were not upserted can also be
+    returned, and so that returned rows can be joined to the `index_` column
+    that follows the fields of each row.
     """
     model = queryset.model
-    # Use all fields except auto fields unless in the uniqueness constraint
-    all_fields = [
-        field
-        for field in _model_fields(model)
-        if field.column in unique_fields or not isinstance(field, models.AutoField)
-    ]
-
     all_field_names = [field.column for field in all_fields]
     all_field_names_sql = ", ".join([_quote(field, cursor) for field in all_field_names])
 
@@ -457,7 +1227,6 @@ def _get_upsert_sql(
     unique_db_cols = [model._meta.get_field(unique_field).column for unique_field in unique_fields]
     update_db_cols = [model._meta.get_field(update_field).column for update_field in update_fields]
 
-    row_values, sql_args = _get_values_for_rows(queryset, model_objs, all_fields)
     unique_field_names_sql = ", ".join([_quote(col, cursor) for col in unique_db_cols])
     update_fields_sql, ignore_unchanged_sql = _get_update_fields_sql(
         queryset=queryset,
@@ -477,482 +1246,1848 @@ def _get_upsert_sql(
         else "DO NOTHING"
     )
 
-    row_values_sql = ", ".join(row_values)
-    sql = (
-        " INSERT INTO {table_name} ({all_field_names_sql})"
-        " VALUES {row_values_sql}"
-        " ON CONFLICT ({unique_field_names_sql}) {on_conflict} {return_sql}"
-    ).format(
+    insert_sql = " INSERT INTO {table_name} ({all_field_names_sql})".format(
         table_name=model._meta.db_table,
         all_field_names_sql=all_field_names_sql,
-        row_values_sql=row_values_sql,
+    )
+    on_conflict_sql = " ON CONFLICT ({unique_field_names_sql}) {on_conflict} {return_sql}".format(
         unique_field_names_sql=unique_field_names_sql,
         on_conflict=on_conflict,
         return_sql=return_sql,
     )
 
-    return sql, sql_args
-
+    if (return_unchanged or ordered) and return_sql:
+        # Rows that were not upserted are selected from the table as it was before
+        # the statement, since the CTEs of a statement cannot see its changes
+        table = _quote(model._meta.db_table, cursor)
+        returning_cols = [
+            _quote(col, cursor)
+            for col in _get_returning_fields(returning, model, include_status=False)
+        ]
+        unique_cols = [_quote(col, cursor) for col in unique_db_cols]
+        unique_keys = [_quote(f"unique{i}_", cursor) for i in range(len(unique_cols))]
+        unique_keys_sql = ", ".join(
+            f"{table}.{col} AS {key}" for col, key in zip(unique_cols, unique_keys)
+        )
+        input_match_sql = " AND ".join(f"input_.{col} = {table}.{col}" for col in unique_cols)
+        upserted_match_sql = " AND ".join(
+            f"upserted_.{key} = {table}.{col}" for col, key in zip(unique_cols, unique_keys)
+        )
+        on_conflict_sql = (
+            f"), upserted_ AS ({insert_sql} SELECT {all_field_names_sql} FROM input_"
+            f"{on_conflict_sql}, {unique_keys_sql}) "
+        )
+        upserted_cols_sql = ", ".join(f"upserted_.{col}" for col in returning_cols)
+        table_cols_sql = ", ".join(f"{table}.{col}" for col in returning_cols)
+        if ordered:
+            # RETURNING cannot reference the input of INSERT ... SELECT, so upserted rows
+            # are joined to the first input row with their unique values, which cannot
+            # be null. Later input rows with the same values, which are ignored by
+            # DO NOTHING, are not joined
+            unique_cols_sql = ", ".join(unique_cols)
+            input_keys_match_sql = " AND ".join(
+                f"first_input_.{col} = upserted_.{key}"
+                for col, key in zip(unique_cols, unique_keys)
+            )
+            on_conflict_sql += (
+                f"SELECT {upserted_cols_sql}, first_input_.index_, upserted_.status_ "
+                f"FROM upserted_ JOIN (SELECT DISTINCT ON ({unique_cols_sql}) * FROM input_ "
+                f"ORDER BY {unique_cols_sql}, index_) AS first_input_ ON {input_keys_match_sql}"
+            )
+            if return_unchanged:
+                on_conflict_sql += (
+                    f" UNION ALL SELECT {table_cols_sql}, input_.index_, 'n' FROM {table} "
+                    f"JOIN input_ ON {input_match_sql} "
+                    f"WHERE NOT EXISTS (SELECT 1 FROM upserted_ WHERE {upserted_match_sql})"
+                )
+        else:
+            on_conflict_sql += (
+                f"SELECT {upserted_cols_sql}, upserted_.status_ FROM upserted_ "
+                f"UNION ALL SELECT {table_cols_sql}, 'n' FROM {table} "
+                f"WHERE EXISTS (SELECT 1 FROM input_ WHERE {input_match_sql}) "
+                f"AND NOT EXISTS (SELECT 1 FROM upserted_ WHERE {upserted_match_sql})"
+            )
 
-def _upsert(
-    queryset: models.QuerySet[_M],
-    model_objs: Iterable[_M],
-    unique_fields: List[str],
-    update_fields: UpdateFieldsTypeDef,
-    exclude: Union[List[str], None],
-    returning: Union[List[str], bool],
-    ignore_unchanged: bool,
-    cursor: "CursorWrapper",
-) -> Union[UpsertResult, None]:
-    """Internal implementation of bulk upsert."""
-    exclude = exclude or []
+        input_cols_sql = f"{all_field_names_sql}, index_" if ordered else all_field_names_sql
+        insert_sql = f"WITH input_ ({input_cols_sql}) AS ("
 
-    # Populate automatically generated fields in the rows like date times
-    _fill_auto_fields(queryset, model_objs)
+    if stats:
+        insert_sql = f"WITH upserted AS ({insert_sql}"
+        on_conflict_sql += (
+            "RETURNING xmax = 0 AS created_) "
+            "SELECT count(*) FILTER (WHERE created_), count(*) FILTER (WHERE NOT created_) "
+            "FROM upserted"
+        )
 
-    # Sort the rows to reduce the chances of deadlock during concurrent upserts
-    model_objs = _sort_by_unique_fields(queryset, model_objs, unique_fields)
-    update_fields = _filter_fields(queryset, update_fields, exclude=[*exclude, *unique_fields])  # type: ignore
+    return insert_sql, on_conflict_sql
 
-    upserted: List["Row"] = []
 
-    if model_objs:
-        sql, sql_args = _get_upsert_sql(
-            queryset,
-            model_objs,
-            unique_fields=unique_fields,
-            update_fields=update_fields,
-            returning=returning,
-            ignore_unchanged=ignore_unchanged,
-            cursor=cursor,
+def _check_duplicates(duplicates: DuplicatesTypeDef) -> None:
+    if duplicates not in (None, "first", "last") and not callable(duplicates):
+        raise ValueError(
+            f'Invalid duplicates "{duplicates}". Must be "first", "last", or a callable.'
         )
 
-        sql_args = _prep_sql_args(queryset, cursor=cursor, sql_args=sql_args)
-        cursor.execute(sql, sql_args)
-        if cursor.description:
-            result = [(col.name, Any) for col in cursor.description]
-            nt_result = NamedTuple("Result", result)
-            upserted = cast(List["Row"], [nt_result(*row) for row in cursor.fetchall()])
-
-    return UpsertResult(upserted) if returning else None
 
+def _collapse_duplicates(
+    objs: Iterable[Tuple[int, Any]],
+    *,
+    duplicates: DuplicatesTypeDef,
+    get_unique_values: Callable[[Any], Tuple[Any, ...]],
+) -> List[Tuple[int, Any]]:
+    """
+    Collapse model objects or rows with the same unique values, which Postgres
+    cannot upsert in the same statement. Objects are paired with their index in
+    the input, and every object is read before duplicates are collapsed.
 
-def _update(
-    queryset: models.QuerySet[_M],
-    model_objs: Iterable[_M],
-    update_fields: Union[List[str], None],
-    exclude: Union[List[str], None],
-    returning: Union[List[str], bool],
-    ignore_unchanged: bool,
-    cursor: "CursorWrapper",
-) -> Union[List["Row"], None]:
+    Objects with null unique values never conflict and are kept. Collapsed objects
+    take the place of the first of their duplicates, with the index of the written
+    object, or of the first object when merging.
     """
-    Core update implementation
+    positions: Dict[Tuple[Any, ...], int] = {}
+    collapsed: List[Tuple[int, Any]] = []
+    for index, obj in objs:
+        key = get_unique_values(obj)
+        if None in key:
+            collapsed.append((index, obj))
+        elif key not in positions:
+            positions[key] = len(collapsed)
+            collapsed.append((index, obj))
+        elif duplicates == "last":
+            collapsed[positions[key]] = (index, obj)
+        elif callable(duplicates):
+            first_index, first_obj = collapsed[positions[key]]
+            collapsed[positions[key]] = (first_index, duplicates(first_obj, obj))
+
+    return collapsed
+
+
+def _get_upsert_update_fields_for_rows(
+    queryset: models.QuerySet[_M], unique_fields: List[str], layout: _Rows
+) -> List[str]:
+    """
+    Return the fields to update from rows of values when upserting. Columns other
+    than the unique fields are updated by default, along with `auto_now` fields,
+    so that existing values of fields that are not in the rows are kept.
     """
     model = queryset.model
-    connection = connections[queryset.db]
-    alias = "new_values"
-    update_fields = _filter_fields(queryset, update_fields, exclude)  # type: ignore
-    update_db_cols = [model._meta.get_field(update_field).column for update_field in update_fields]
+    unique_attnames = _get_attnames(model, unique_fields)
+    auto_now_attnames = [
+        field.attname
+        for field in _model_fields(model)
+        if getattr(field, "auto_now", False) and field.attname not in layout.columns
+    ]
+    return [
+        column for column in (*layout.columns, *auto_now_attnames) if column not in unique_attnames
+    ]
+
+
+def _get_sort_key(
+    get_values: Callable[[Any], Tuple[Any, ...]], row: Any
+) -> Tuple[Tuple[bool, Any], ...]:
+    """
+    Return the key that a row is sorted by from its values. Null values, which
+    cannot be compared with other values, are sorted last.
+    """
+    return tuple((value is None, value) for value in get_values(row))
+
+
+class _UpsertPlan(NamedTuple):
+    """The fields and SQL of an upsert, computed once for every batch."""
+
+    all_fields: List[AnyField]
+    # Gets the unique values of a row, which rows are sorted by
+    get_unique_values: Callable[[List[Any]], Tuple[Any, ...]]
+    db_types: List[str]
+    postgres_types: List[str]
+    insert_sql: str
+    on_conflict_sql: str
+
+
+def _get_upsert_plan(
+    queryset: models.QuerySet[_M],
+    unique_fields: List[str],
+    update_fields: UpdateFieldsTypeDef,
+    exclude: List[str],
+    returning: Union[List[str], bool],
+    ignore_unchanged: bool,
+    return_unchanged: bool,
+    ordered: bool,
+    stats: bool,
+    cursor: "CursorWrapper",
+) -> _UpsertPlan:
+    def build() -> _UpsertPlan:
+        connection = connections[queryset.db]
+        filtered_update_fields = _filter_fields(
+            queryset, update_fields, exclude=[*exclude, *unique_fields]
+        )
+        all_fields = _get_upsert_fields(queryset.model, unique_fields)
+        insert_sql, on_conflict_sql = _get_upsert_sql(
+            queryset,
+            all_fields,
+            unique_fields=unique_fields,
+            update_fields=filtered_update_fields,
+            returning=returning,
+            ignore_unchanged=ignore_unchanged,
+            return_unchanged=return_unchanged,
+            ordered=ordered,
+            stats=stats,
+            cursor=cursor,
+        )
+        return _UpsertPlan(
+            all_fields=all_fields,
+            get_unique_values=_tuple_getter(
+                operator.itemgetter,
+                [all_fields.index(queryset.model._meta.get_field(f)) for f in unique_fields],
+            ),
+            db_types=[field.db_type(connection) for field in all_fields],
+            postgres_types=_postgres_types_for_fields(all_fields, connection),
+            insert_sql=insert_sql,
+            on_conflict_sql=on_conflict_sql,
+        )
+
+    key = _get_plan_key(
+        queryset,
+        "upsert",
+        unique_fields,
+        update_fields,
+        exclude,
+        returning,
+        ignore_unchanged,
+        return_unchanged,
+        ordered,
+        stats,
+    )
+    return _get_plan(key, build)
 
-    # Sort the model objects to reduce the likelihood of deadlocks
-    model_objs = sorted(model_objs, key=lambda obj: obj.pk)
 
-    if not model._meta.pk:  # pragma: no cover - for type-safety
-        raise ValueError("Model must have a primary key to perform a bulk update.")
+def _upsert(
+    queryset: models.QuerySet[_M],
+    model_objs: ModelObjsTypeDef[_M],
+    unique_fields: List[str],
+    update_fields: UpdateFieldsTypeDef,
+    exclude: Union[List[str], None],
+    columns: Union[List[str], None],
+    returning: Union[List[str], bool],
+    ignore_unchanged: bool,
+    batch_size: Union[int, None],
+    batch_bytes: Union[int, None],
+    window_size: Union[int, None],
+    method: WriteMethodTypeDef,
+    cursor: "CursorWrapper",
+    stream: bool = False,
+    returning_format: ReturningFormatTypeDef = "rows",
+    stats: bool = False,
+    return_unchanged: bool = False,
+    set_returned: bool = False,
+    duplicates: DuplicatesTypeDef = None,
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+) -> "_Writer[Union[UpsertResult, UpsertColumnsResult, UpsertStats, None]]":
+    """Internal implementation of bulk upsert."""
+    _check_method(method)
+    _check_prepare(prepare, cursor)
+    _check_pipeline(pipeline)
+    _check_duplicates(duplicates)
+    # Rows are copied and streamed one statement at a time
+    pipeline = pipeline and not stream and method != "copy"
+    if stream and batch_size is None:
+        batch_size = _STREAM_BATCH_SIZE
+    plan: Union[_UpsertPlan, None] = None
+    unnest_sql: Union[str, None] = None
+    staging_table: Union[str, None] = None
+
+    if stats and returning:
+        raise ValueError("stats cannot be used with returning.")
+
+    if ordered and not returning:
+        raise ValueError("returning must be provided with ordered=True.")
+
+    if set_returned and not returning:
+        raise ValueError("returning must be provided with set_returned=True.")
+
+    # Rows are sent with the index of their model object and return it when they
+    # are ordered or when returned values are set onto the model objects
+    indexed = ordered or set_returned
+    returned_columns = _get_returning_fields(
+        returning, queryset.model, include_status=True, include_index=indexed
+    )
+    upserted = _Returned(returned_columns, returning_format)
+    execute = functools.partial(
+        _Execute,
+        stream=stream,
+        returning_format="tuples" if stats else upserted.statement_format,
+        prepare=prepare,
+    )
+    # The number of created, updated, and unchanged rows
+    counts = [0, 0, 0]
 
-    # Add the pk to the value fields so we can join during the update.
-    value_fields = [model._meta.pk.attname] + update_fields
+    # Populate automatically generated fields in the rows like date times
+    objs, layout = _get_rows(queryset, model_objs, columns, fill_auto_fields=True)
+    if set_returned and layout is not None:
+        raise ValueError("set_returned can only be used with model objects.")
+
+    if layout is not None and update_fields is None:
+        update_fields = _get_upsert_update_fields_for_rows(queryset, unique_fields, layout)
+
+    set_returned_values = None
+    if set_returned:
+        set_returned_values = _get_returned_setter(queryset, returned_columns)
+
+    # Objects are paired with their index in the input, which is sent with
+    # their rows when rows are ordered or matched to their objects
+    indexed_objs: Iterable[Tuple[int, Any]] = enumerate(objs)
+    if duplicates:
+        indexed_objs = _collapse_duplicates(
+            indexed_objs,
+            duplicates=duplicates,
+            get_unique_values=_get_row_getter(
+                [queryset.model._meta.get_field(f) for f in unique_fields], layout
+            ),
+        )
 
-    row_values = [
-        [
-            _get_field_db_val(
+    index_db_types = ["bigint"] if indexed else []
+    expression_positions: Set[int] = set()
+    render_expressions: Union[Callable[[List[List[Any]], Set[int]], None], None] = None
+    extract_row: Union[Callable[[Any], List[Any]], None] = None
+    for window in _windows(indexed_objs, window_size):
+        if plan is None:
+            plan = _get_upsert_plan(
                 queryset,
-                model_obj._meta.get_field(field),
-                getattr(model_obj, model_obj._meta.get_field(field).attname),
-                connection,
+                unique_fields=unique_fields,
+                update_fields=update_fields,
+                exclude=exclude or [],
+                returning=returning,
+                ignore_unchanged=ignore_unchanged,
+                return_unchanged=return_unchanged,
+                ordered=indexed,
+                stats=stats,
+                cursor=cursor,
             )
-            for field in value_fields
-        ]
-        for model_obj in model_objs
-    ]
+            if method == "unnest":
+                unnest_sql = _get_unnest_sql(plan.all_fields, plan.db_types + index_db_types)
+
+        # Row extractors record the expressions of each write, so they are not cached
+        extract_row = extract_row or _get_row_extractor(
+            queryset,
+            plan.all_fields,
+            copying=method == "copy",
+            layout=layout,
+            expression_positions=expression_positions,
+        )
+
+        # Values are prepared once and the prepared rows are sorted, which greatly
+        # reduces the chances of deadlock during concurrent upserts
+        rows = [extract_row(obj) for _, obj in window]
+        _check_expressions(method, expression_positions)
+        window_returned: List["Row"] = []
+        objs_by_index: Dict[int, _M] = {}
+        if indexed:
+            # Returned rows are joined to their input row with its unique values
+            if any(None in plan.get_unique_values(row) for row in rows):
+                raise ValueError(
+                    "Unique fields cannot be null with ordered=True or set_returned=True."
+                )
+
+            for (index, _), row in zip(window, rows):
+                row.append(index)
+
+            if set_returned:
+                objs_by_index = dict(window)
+
+        if not presorted:
+            rows.sort(key=functools.partial(_get_sort_key, plan.get_unique_values))
 
-    # If we do not have any values or fields to update, just return
-    if len(row_values) == 0 or len(update_fields) == 0:
+        if method == "copy" and staging_table is None:
+            staging_table, staging_table_sql = _get_staging_table_sql(
+                queryset, plan.all_fields, cursor, ordered=indexed
+            )
+            yield _Execute(staging_table_sql)
+
+        batches = _batch_rows(
+            rows,
+            batch_size=batch_size,
+            batch_bytes=batch_bytes,
+            max_params=_MAX_QUERY_PARAMS if method == "values" else None,
+        )
+        if prepare and method == "values":
+            batches = _bucket_batches(batches)
+
+        # The number of rows written by each statement along with its returned rows.
+        # Pipelined statements are sent together after every batch of the window
+        results: List[Tuple[int, List["Row"]]] = []
+        pipelined: List[Tuple[int, _Execute]] = []
+        for batch in batches:
+            if staging_table:
+                yield _CopyRows(
+                    _get_copy_sql(
+                        staging_table, plan.all_fields, binary=True, cursor=cursor, ordered=indexed
+                    ),
+                    postgres_types=plan.postgres_types + (["int8"] if indexed else []),
+                    rows=batch,
+                )
+                sql = f"{plan.insert_sql} SELECT * FROM {staging_table}{plan.on_conflict_sql}"
+                sql_args = None
+            elif unnest_sql:
+                sql = f"{plan.insert_sql} SELECT * FROM {unnest_sql}{plan.on_conflict_sql}"
+                sql_args = _get_columns_for_rows(batch, method=method)
+            else:
+                if (return_unchanged or indexed) and any(
+                    val is _DB_DEFAULT for row in batch for val in row
+                ):
+                    raise ValueError(
+                        "DB defaults are not supported with return_unchanged=True, ordered=True,"
+                        " or set_returned=True."
+                    )
+
+                if expression_positions:
+                    render_expressions = render_expressions or _get_expression_renderer(
+                        queryset, cursor
+                    )
+                    render_expressions(batch, expression_positions)
+
+                row_values, sql_args = _get_placeholders_for_rows(
+                    batch, plan.db_types + index_db_types
+                )
+                sql = f"{plan.insert_sql} VALUES {', '.join(row_values)}{plan.on_conflict_sql}"
+
+            # Statements of staging tables are not repeated by later writes, and
+            # expressions are rendered into literals that cannot be bound on the server
+            statement = execute(
+                sql, sql_args, prepare=prepare and not staging_table and not expression_positions
+            )
+            if pipeline:
+                pipelined.append((len(batch), statement))
+            else:
+                results.append((len(batch), (yield statement)))
+
+            if staging_table:
+                yield _Execute(f"TRUNCATE {staging_table}")
+
+        if pipelined:
+            returned_rows = yield _Pipeline([statement for _, statement in pipelined])
+            results.extend(zip([num_written for num_written, _ in pipelined], returned_rows))
+
+        for num_written, returned in results:
+            if stats:
+                num_created, num_updated = cast(Tuple[int, int], returned[0])
+                counts[0] += num_created
+                counts[1] += num_updated
+                counts[2] += num_written - num_created - num_updated
+            else:
+                if set_returned_values:
+                    set_returned_values(objs_by_index, returned)
+
+                if ordered:
+                    window_returned.extend(returned)
+                else:
+                    upserted.extend(returned)
+
+        if ordered:
+            window_returned.sort(key=operator.itemgetter(-2))
+            upserted.extend(window_returned)
+
+    if staging_table:
+        yield _Execute(f"DROP TABLE {staging_table}")
+
+    if stats:
+        return UpsertStats(*counts)
+
+    if not returning:
         return None
 
-    db_types = [model._meta.get_field(field).db_type(connection) for field in value_fields]
+    result = upserted.result()
+    return UpsertColumnsResult(result) if isinstance(result, dict) else UpsertResult(result)
 
-    value_fields_sql = ", ".join(
-        "{field}".format(field=_quote(model._meta.get_field(field).column, cursor))
-        for field in value_fields
-    )
 
-    update_fields_sql = ", ".join(
-        "{field} = {alias}.{field}".format(field=_quote(col, cursor), alias=alias)
-        for col in update_db_cols
+class _UpdatePlan(NamedTuple):
+    """The fields and SQL of an update, computed once for every batch."""
+
+    value_db_fields: List[AnyField]
+    db_types: List[str]
+    postgres_types: List[str]
+    update_sql: str
+    from_sql: str
+
+
+def _get_update_plan(
+    queryset: models.QuerySet[_M],
+    update_fields: Union[List[str], None],
+    exclude: Union[List[str], None],
+    returning: Union[List[str], bool],
+    ignore_unchanged: bool,
+    cursor: "CursorWrapper",
+    ordered: bool = False,
+) -> Union[_UpdatePlan, None]:
+    """
+    Return the plan of an update. `None` is returned when there are no
+    fields to update. If `ordered`, the values have an `index_` column
+    that is returned after the returned fields.
+    """
+
+    def build() -> Union[_UpdatePlan, None]:
+        model = queryset.model
+        connection = connections[queryset.db]
+        alias = "new_values"
+        filtered_update_fields = _filter_fields(queryset, update_fields, exclude)
+        update_db_cols = [
+            model._meta.get_field(update_field).column for update_field in filtered_update_fields
+        ]
+
+        if not model._meta.pk:  # pragma: no cover - for type-safety
+            raise ValueError("Model must have a primary key to perform a bulk update.")
+
+        # If we do not have any fields to update, just return
+        if len(filtered_update_fields) == 0:
+            return None
+
+        # Add the pk to the value fields so we can join during the update.
+        value_fields = [model._meta.pk.attname] + filtered_update_fields
+        value_db_fields = [model._meta.get_field(field) for field in value_fields]
+
+        value_fields_sql = ", ".join(
+            [
+                *(
+                    "{field}".format(field=_quote(field.column, cursor))
+                    for field in value_db_fields
+                ),
+                *(["index_"] if ordered else []),
+            ]
+        )
+
+        update_fields_sql = ", ".join(
+            "{field} = {alias}.{field}".format(field=_quote(col, cursor), alias=alias)
+            for col in update_db_cols
+        )
+        update_fields_sql, ignore_unchanged_sql = _get_update_fields_sql(
+            queryset=queryset,
+            fields=filtered_update_fields,
+            alias=alias,
+            ignore_unchanged=ignore_unchanged,
+            cursor=cursor,
+        )
+
+        if ignore_unchanged_sql:
+            ignore_unchanged_sql = f"AND {ignore_unchanged_sql}"
+
+        table = _quote(model._meta.db_table, cursor)
+        return _UpdatePlan(
+            value_db_fields=value_db_fields,
+            db_types=[field.db_type(connection) for field in value_db_fields],
+            postgres_types=_postgres_types_for_fields(value_db_fields, connection),
+            update_sql=f"UPDATE {table} SET {update_fields_sql} FROM ",
+            from_sql=(
+                " AS {alias} ({value_fields_sql}) "
+                "WHERE {table}.{pk_field} = new_values.{pk_field} {ignore_unchanged_sql} "
+                "{returning_sql}"
+            ).format(
+                table=table,
+                pk_field=_quote(model._meta.pk.column, cursor),
+                alias=alias,
+                value_fields_sql=value_fields_sql,
+                ignore_unchanged_sql=ignore_unchanged_sql,
+                returning_sql=_get_returning_sql(
+                    returning=returning, model=model, include_status=False, cursor=cursor
+                )
+                + (f", {alias}.index_" if ordered else ""),
+            ),
+        )
+
+    key = _get_plan_key(
+        queryset, "update", update_fields, exclude, returning, ignore_unchanged, ordered
     )
-    update_fields_sql, ignore_unchanged_sql = _get_update_fields_sql(
-        queryset=queryset,
-        fields=update_fields,
-        alias=alias,
+    return _get_plan(key, build)
+
+
+def _get_update_fields_for_rows(
+    queryset: models.QuerySet[_M], update_fields: Union[List[str], None], layout: _Rows
+) -> List[str]:
+    """
+    Return the fields to update from rows of values. All columns other than the
+    primary key are updated by default.
+    """
+    model = queryset.model
+    pk_attname = model._meta.pk.attname  # type: ignore
+    if pk_attname not in layout.columns:
+        raise ValueError("Rows must have a primary key column to be updated.")
+
+    if update_fields is None:
+        return [column for column in layout.columns if column != pk_attname]
+
+    for update_field in update_fields:
+        if model._meta.get_field(update_field).attname not in layout.columns:  # type: ignore
+            raise ValueError(f'Update field "{update_field}" is not a column of the rows.')
+
+    return update_fields
+
+
+def _update(
+    queryset: models.QuerySet[_M],
+    model_objs: ModelObjsTypeDef[_M],
+    update_fields: Union[List[str], None],
+    exclude: Union[List[str], None],
+    columns: Union[List[str], None],
+    returning: Union[List[str], bool],
+    ignore_unchanged: bool,
+    batch_size: Union[int, None],
+    batch_bytes: Union[int, None],
+    window_size: Union[int, None],
+    method: WriteMethodTypeDef,
+    cursor: "CursorWrapper",
+    stream: bool = False,
+    returning_format: ReturningFormatTypeDef = "rows",
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+) -> "_Writer[Union[List[Row], Dict[str, Any], None]]":
+    """
+    Core update implementation
+    """
+    _check_method(method)
+    _check_prepare(prepare, cursor)
+    _check_pipeline(pipeline)
+    # Rows are copied and streamed one statement at a time
+    pipeline = pipeline and not stream and method != "copy"
+    if stream and batch_size is None:
+        batch_size = _STREAM_BATCH_SIZE
+    if ordered and not returning:
+        raise ValueError("returning must be provided with ordered=True.")
+
+    objs, layout = _get_rows(queryset, model_objs, columns, fill_auto_fields=False)
+    if layout is not None:
+        update_fields = _get_update_fields_for_rows(queryset, update_fields, layout)
+
+    plan = _get_update_plan(
+        queryset,
+        update_fields=update_fields,
+        exclude=exclude,
+        returning=returning,
         ignore_unchanged=ignore_unchanged,
         cursor=cursor,
+        ordered=ordered,
     )
 
-    values_sql = ", ".join(
-        [
-            "({0})".format(
-                ", ".join(
-                    [
-                        "%s::{0}".format(db_types[i]) if not row_number and i else "%s"
-                        for i, _ in enumerate(row)
-                    ]
-                )
-            )
-            for row_number, row in enumerate(row_values)
-        ]
+    # If we do not have any fields to update, just return
+    if plan is None:
+        return None
+
+    # Rows are sent with the index of their model object when ordered
+    db_types = plan.db_types + (["bigint"] if ordered else [])
+    unnest_sql = _get_unnest_sql(plan.value_db_fields, db_types) if method == "unnest" else None
+    expression_positions: Set[int] = set()
+    render_expressions: Union[Callable[[List[List[Any]], Set[int]], None], None] = None
+    extract_row = _get_row_extractor(
+        queryset,
+        plan.value_db_fields,
+        copying=method == "copy",
+        layout=layout,
+        expression_positions=expression_positions,
     )
 
-    if ignore_unchanged_sql:
-        ignore_unchanged_sql = f"AND {ignore_unchanged_sql}"
-
-    update_sql = (
-        "UPDATE {table} "
-        "SET {update_fields_sql} "
-        "FROM (VALUES {values_sql}) AS {alias} ({value_fields_sql}) "
-        "WHERE {table}.{pk_field} = new_values.{pk_field} {ignore_unchanged_sql} "
-        "{returning_sql}"
-    ).format(
-        table=_quote(model._meta.db_table, cursor),
-        pk_field=_quote(model._meta.pk.column, cursor),
-        alias=alias,
-        update_fields_sql=update_fields_sql,
-        values_sql=values_sql,
-        value_fields_sql=value_fields_sql,
-        ignore_unchanged_sql=ignore_unchanged_sql,
-        returning_sql=_get_returning_sql(
-            returning=returning, model=model, include_status=False, cursor=cursor
+    updated = _Returned(
+        _get_returning_fields(
+            returning, queryset.model, include_status=False, include_index=ordered
         ),
+        returning_format,
+    )
+    execute = functools.partial(
+        _Execute, stream=stream, returning_format=updated.statement_format, prepare=prepare
     )
+    num_rows = 0
+    staging_table: Union[str, None] = None
+    for window in _windows(objs, window_size):
+        # Sort the rows by primary key to reduce the likelihood of deadlocks
+        row_values = [extract_row(obj) for obj in window]
+        _check_expressions(method, expression_positions)
+        window_returned: List["Row"] = []
+        if ordered:
+            for index, row in enumerate(row_values, num_rows):
+                row.append(index)
+
+        if not presorted:
+            row_values.sort(key=operator.itemgetter(0))
+
+        num_rows += len(window)
+
+        if method == "copy" and staging_table is None:
+            staging_table, staging_table_sql = _get_staging_table_sql(
+                queryset, plan.value_db_fields, cursor, ordered=ordered
+            )
+            yield _Execute(staging_table_sql)
+
+        batches = _batch_rows(
+            row_values,
+            batch_size=batch_size,
+            batch_bytes=batch_bytes,
+            max_params=_MAX_QUERY_PARAMS if method == "values" else None,
+        )
+        if prepare and method == "values":
+            batches = _bucket_batches(batches)
+
+        # Pipelined statements are sent together after every batch of the window
+        results: List[List["Row"]] = []
+        pipelined: List[_Execute] = []
+        for batch in batches:
+            if staging_table:
+                yield _CopyRows(
+                    _get_copy_sql(
+                        staging_table,
+                        plan.value_db_fields,
+                        binary=True,
+                        cursor=cursor,
+                        ordered=ordered,
+                    ),
+                    postgres_types=plan.postgres_types + (["int8"] if ordered else []),
+                    rows=batch,
+                )
+                # Analyze the staging table so that the planner can choose a good join
+                yield _Execute(f"ANALYZE {staging_table}")
+                values_sql = staging_table
+                update_sql_params = None
+            elif unnest_sql:
+                values_sql = unnest_sql
+                update_sql_params = _get_columns_for_rows(batch, method=method)
+            else:
+                values_sql = "(VALUES {0})".format(
+                    ", ".join(
+                        [
+                            "({0})".format(
+                                ", ".join(
+                                    [
+                                        "%s::{0}".format(db_types[i])
+                                        if not row_number and i
+                                        else "%s"
+                                        for i, _ in enumerate(row)
+                                    ]
+                                )
+                            )
+                            for row_number, row in enumerate(batch)
+                        ]
+                    )
+                )
+                if expression_positions:
+                    render_expressions = render_expressions or _get_expression_renderer(
+                        queryset, cursor
+                    )
+                    render_expressions(batch, expression_positions)
+
+                update_sql_params = list(itertools.chain(*batch))
+
+            sql = f"{plan.update_sql}{values_sql}{plan.from_sql}"
+            statement = execute(
+                sql,
+                update_sql_params,
+                prepare=prepare and not staging_table and not expression_positions,
+            )
+            if pipeline:
+                pipelined.append(statement)
+            else:
+                results.append((yield statement))
+
+            if staging_table:
+                yield _Execute(f"TRUNCATE {staging_table}")
+
+        if pipelined:
+            results.extend((yield _Pipeline(pipelined)))
+
+        for returned in results:
+            if ordered:
+                window_returned.extend(returned)
+            else:
+                updated.extend(returned)
+
+        if ordered:
+            window_returned.sort(key=operator.itemgetter(-1))
+            updated.extend(window_returned)
 
-    update_sql_params = list(itertools.chain(*row_values))
-    update_sql_params = _prep_sql_args(queryset, cursor=cursor, sql_args=update_sql_params)
-    cursor.execute(update_sql, update_sql_params)
-    updated: List["Row"] = []
-    if cursor.description:
-        result = [(col.name, Any) for col in cursor.description]
-        nt_result = NamedTuple("Result", result)
-        updated = cast(List["Row"], [nt_result(*row) for row in cursor.fetchall()])
+    if staging_table:
+        yield _Execute(f"DROP TABLE {staging_table}")
 
-    return updated if returning else None
+    # If we did not have any values to update, nothing is returned
+    if num_rows == 0:
+        return None
+
+    return updated.result() if returning else None
 
 
 @overload
 def update(
     queryset: QuerySet[_M],
-    model_objs: Iterable[_M],
+    model_objs: ModelObjsTypeDef[_M],
+    update_fields: Union[List[str], None] = None,
+    *,
+    exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
+    returning: Union[List[str], Literal[True]],
+    returning_format: Literal["rows", "tuples"] = "rows",
+    ignore_unchanged: bool = False,
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    stream: Literal[True],
+) -> Iterator["Row"]: ...
+
+
+@overload
+def update(
+    queryset: QuerySet[_M],
+    model_objs: ModelObjsTypeDef[_M],
     update_fields: Union[List[str], None] = None,
     *,
     exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
     returning: Union[List[str], Literal[True]],
+    returning_format: Literal["rows", "tuples"] = "rows",
     ignore_unchanged: bool = False,
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    stream: Literal[False] = False,
 ) -> List["Row"]: ...
 
 
 @overload
 def update(
     queryset: QuerySet[_M],
-    model_objs: Iterable[_M],
+    model_objs: ModelObjsTypeDef[_M],
+    update_fields: Union[List[str], None] = None,
+    *,
+    exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
+    returning: Union[List[str], Literal[True]],
+    returning_format: Literal["columns", "numpy"],
+    ignore_unchanged: bool = False,
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    stream: Literal[False] = False,
+) -> Dict[str, Any]: ...
+
+
+@overload
+def update(
+    queryset: QuerySet[_M],
+    model_objs: ModelObjsTypeDef[_M],
     update_fields: Union[List[str], None] = None,
     *,
     exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
     returning: Literal[False] = False,
+    returning_format: ReturningFormatTypeDef = "rows",
     ignore_unchanged: bool = False,
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    stream: Literal[False] = False,
 ) -> None: ...
 
 
 @overload
 def update(
     queryset: QuerySet[_M],
-    model_objs: Iterable[_M],
+    model_objs: ModelObjsTypeDef[_M],
     update_fields: Union[List[str], None] = None,
     *,
     exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
     returning: Union[List[str], bool] = False,
+    returning_format: ReturningFormatTypeDef = "rows",
     ignore_unchanged: bool = False,
-) -> Union[List["Row"], None]: ...
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    stream: bool = False,
+) -> Union[List["Row"], Dict[str, Any], Iterator["Row"], None]: ...
 
 
 def update(
     queryset: QuerySet[_M],
-    model_objs: Iterable[_M],
+    model_objs: ModelObjsTypeDef[_M],
     update_fields: Union[List[str], None] = None,
     *,
     exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
     returning: Union[List[str], bool] = False,
+    returning_format: ReturningFormatTypeDef = "rows",
     ignore_unchanged: bool = False,
-) -> Union[List["Row"], None]:
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    stream: bool = False,
+) -> Union[List["Row"], Dict[str, Any], Iterator["Row"], None]:
     """
     Performs a bulk update.
 
     Args:
         queryset: A model or a queryset for the table being updated.
-        model_objs: Model object values to use for the update.
+        model_objs: Model object values to use for the update. Rows of values
+            can be used instead of model objects. See `columns`.
         update_fields: A list of fields on the model objects to update.
-            If `None`, all fields will be updated.
+            If `None`, all fields will be updated. When updating rows of values,
+            all columns are updated by default.
         exclude: A list of fields to exclude from the update. This is useful
             when `update_fields` is `None` and you want to exclude fields from
             being updated.
+        columns: The fields of the values in each row when `model_objs` are
+            sequences such as tuples. Mappings of fields to values, or a mapping
+            of fields to sequences of column values, can be used without
+            `columns`. Rows must include the primary key.
         returning: If True, returns all fields. If a list, only returns fields
             in the list. If False, do not return results from the upsert.
+        returning_format: `"rows"` returns named tuples. `"tuples"` returns plain
+            tuples of values in the order of the returned fields, which avoids
+            the overhead of named tuples. `"columns"` returns a dictionary of
+            lists of the values of each returned field, and `"numpy"` returns
+            a dictionary of NumPy arrays.
         ignore_unchanged: Ignore unchanged rows in updates.
+        ordered: Return rows in the order of `model_objs`, with an `index_` of
+            the position of each row in `model_objs` after the returned fields.
+            Streamed rows have an `index_` but are not reordered.
+        presorted: Skip sorting the rows of each window by primary key when
+            `model_objs` are already sorted. Rows are written in the given order,
+            so concurrent updates of unsorted rows are more likely to deadlock.
+        prepare: Prepare statements on the server so that Postgres parses and
+            plans statements with the same shape once per connection. With the
+            `"values"` method, batches are split into batches with a power of two
+            rows so that their statements repeat. Statements are not prepared
+            with the `"copy"` method or when streaming. Requires the
+            `"prepare_threshold"` database option and psycopg3.
+        pipeline: Send the statements of every batch in a window together with
+            psycopg3 pipeline mode, waiting for one network round trip instead of
+            one for each statement. Statements are not pipelined with the `"copy"`
+            method or when streaming.
+        batch_size: The maximum number of rows in each statement. Rows are split
+            into batches that are executed in sequence in the same transaction.
+        batch_bytes: The approximate maximum size of the values in each statement,
+            in bytes. Can be combined with `batch_size`. Batches are always capped
+            at the number of query parameters Postgres allows.
+        window_size: Pull at most this many model objects from `model_objs` into
+            memory at a time. Each window is sorted and written before the next
+            is consumed, allowing iterators of any size to be written. Rows are
+            only sorted within their window.
+        method: How rows are sent to Postgres. `"values"` renders rows into the
+            statement. `"unnest"` sends each column as one array parameter, keeping
+            the statement the same size regardless of the number of rows. `"copy"`
+            copies rows into an analyzed temporary table with binary `COPY FROM`
+            and joins against it, which is faster for large batches. Only
+            available with psycopg3. Expressions as values are only supported
+            with `"values"`.
+        stream: Return an iterator of the returned rows instead of a list.
+            Statements run as the iterator is consumed, and the rows returned by
+            each statement are received before they are yielded, so use `batch_size`
+            to limit the rows held in memory. Statements have at most 1000 rows
+            when `batch_size` is not given. Only available with psycopg3 and
+            `returning`.
 
     Note:
-        Model signals such as `post_save` are not emitted.
+        Model signals such as `post_save` are not emitted. When streaming, rows
+        are written as the iterator is consumed, and the transaction is committed
+        once it is exhausted. Closing the iterator early rolls back the write.
 
     Returns:
         If `returning=True`, an iterable list of all updated objects.
     """
     queryset = queryset if isinstance(queryset, models.QuerySet) else queryset.objects.all()
-    with connections[queryset.db].cursor() as cursor:
-        return _update(
-            queryset=queryset,
-            model_objs=model_objs,
-            update_fields=update_fields,
-            exclude=exclude,
-            returning=returning,
-            ignore_unchanged=ignore_unchanged,
-            cursor=cursor,
-        )
+    make_writer = functools.partial(
+        _update,
+        queryset=queryset,
+        model_objs=model_objs,
+        update_fields=update_fields,
+        exclude=exclude,
+        columns=columns,
+        returning=returning,
+        returning_format=returning_format,
+        ignore_unchanged=ignore_unchanged,
+        ordered=ordered,
+        presorted=presorted,
+        prepare=prepare,
+        pipeline=pipeline,
+        batch_size=batch_size,
+        batch_bytes=batch_bytes,
+        window_size=window_size,
+        method=method,
+        stream=stream,
+    )
+    if stream:
+        _check_stream(returning, returning_format)
+        return _stream_writes(queryset, make_writer)
+
+    with transaction.atomic(using=queryset.db, savepoint=False):
+        with connections[queryset.db].cursor() as cursor:
+            return _run_writer(make_writer(cursor=cursor), cursor)
 
 
 @overload
 async def aupdate(
     queryset: QuerySet[_M],
-    model_objs: Iterable[_M],
+    model_objs: ModelObjsTypeDef[_M],
     update_fields: Union[List[str], None] = None,
     *,
     exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
     returning: Union[List[str], Literal[True]],
+    returning_format: Literal["rows", "tuples"] = "rows",
     ignore_unchanged: bool = False,
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    aconnection: Union["AsyncConnection[Any]", None] = None,
 ) -> List["Row"]: ...
 
 
 @overload
 async def aupdate(
     queryset: QuerySet[_M],
-    model_objs: Iterable[_M],
+    model_objs: ModelObjsTypeDef[_M],
+    update_fields: Union[List[str], None] = None,
+    *,
+    exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
+    returning: Union[List[str], Literal[True]],
+    returning_format: Literal["columns", "numpy"],
+    ignore_unchanged: bool = False,
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    aconnection: Union["AsyncConnection[Any]", None] = None,
+) -> Dict[str, Any]: ...
+
+
+@overload
+async def aupdate(
+    queryset: QuerySet[_M],
+    model_objs: ModelObjsTypeDef[_M],
     update_fields: Union[List[str], None] = None,
     *,
     exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
     returning: Literal[False] = False,
+    returning_format: ReturningFormatTypeDef = "rows",
     ignore_unchanged: bool = False,
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    aconnection: Union["AsyncConnection[Any]", None] = None,
 ) -> None: ...
 
 
 @overload
 async def aupdate(
     queryset: QuerySet[_M],
-    model_objs: Iterable[_M],
+    model_objs: ModelObjsTypeDef[_M],
     update_fields: Union[List[str], None] = None,
     *,
     exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
     returning: Union[List[str], bool] = False,
+    returning_format: ReturningFormatTypeDef = "rows",
     ignore_unchanged: bool = False,
-) -> Union[List["Row"], None]: ...
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    aconnection: Union["AsyncConnection[Any]", None] = None,
+) -> Union[List["Row"], Dict[str, Any], None]: ...
 
 
 async def aupdate(
     queryset: QuerySet[_M],
-    model_objs: Iterable[_M],
+    model_objs: ModelObjsTypeDef[_M],
     update_fields: Union[List[str], None] = None,
     *,
     exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
     returning: Union[List[str], bool] = False,
+    returning_format: ReturningFormatTypeDef = "rows",
     ignore_unchanged: bool = False,
-) -> Union[List["Row"], None]:
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    aconnection: Union["AsyncConnection[Any]", None] = None,
+) -> Union[List["Row"], Dict[str, Any], None]:
     """
     Perform an asynchronous bulk update.
 
     See [pgbulk.update][]
 
+    Args:
+        aconnection: A psycopg3 `AsyncConnection`, such as one opened with
+            [pgbulk.aconnect][]. If provided, the update is executed natively
+            on the connection in its own transaction.
+
     Note:
-        Like other async Django ORM methods, `aupdate` currently wraps `update` in
-        a `sync_to_async` wrapper. It does not yet use an asynchronous database
-        driver but will in the future.
+        Like other async Django ORM methods, `aupdate` wraps `update` in a
+        `sync_to_async` wrapper unless `aconnection` is provided.
     """
-    return await sync_to_async(update)(
+    if aconnection is not None:
+        queryset = queryset if isinstance(queryset, models.QuerySet) else queryset.objects.all()
+        async with _acursor(aconnection) as cursor:
+            writer = _update(
+                queryset=queryset,
+                model_objs=model_objs,
+                update_fields=update_fields,
+                exclude=exclude,
+                columns=columns,
+                returning=returning,
+                returning_format=returning_format,
+                ignore_unchanged=ignore_unchanged,
+                ordered=ordered,
+                presorted=presorted,
+                prepare=prepare,
+                pipeline=pipeline,
+                batch_size=batch_size,
+                batch_bytes=batch_bytes,
+                window_size=window_size,
+                method=method,
+                cursor=cursor,
+            )
+            return await _arun_writer(writer, cursor)
+
+    updated = await sync_to_async(update)(
         queryset,
         model_objs,
         update_fields=update_fields,
         exclude=exclude,
+        columns=columns,
         returning=returning,
+        returning_format=returning_format,
         ignore_unchanged=ignore_unchanged,
+        ordered=ordered,
+        presorted=presorted,
+        prepare=prepare,
+        pipeline=pipeline,
+        batch_size=batch_size,
+        batch_bytes=batch_bytes,
+        window_size=window_size,
+        method=method,
     )
+    # Rows are only streamed with stream=True
+    return cast(Union[List["Row"], Dict[str, Any], None], updated)
 
 
 @overload
 def upsert(
     queryset: QuerySet[_M],
-    model_objs: Iterable[_M],
+    model_objs: ModelObjsTypeDef[_M],
+    unique_fields: List[str],
+    update_fields: UpdateFieldsTypeDef = None,
+    *,
+    exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
+    returning: Union[List[str], Literal[True]],
+    returning_format: Literal["rows", "tuples"] = "rows",
+    stats: Literal[False] = False,
+    ignore_unchanged: bool = False,
+    return_unchanged: bool = False,
+    set_returned: bool = False,
+    duplicates: DuplicatesTypeDef = None,
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    stream: Literal[True],
+) -> Iterator["Row"]: ...
+
+
+@overload
+def upsert(
+    queryset: QuerySet[_M],
+    model_objs: ModelObjsTypeDef[_M],
     unique_fields: List[str],
     update_fields: UpdateFieldsTypeDef = None,
     *,
     exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
     returning: Union[List[str], Literal[True]],
+    returning_format: Literal["rows", "tuples"] = "rows",
+    stats: Literal[False] = False,
     ignore_unchanged: bool = False,
+    return_unchanged: bool = False,
+    set_returned: bool = False,
+    duplicates: DuplicatesTypeDef = None,
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    stream: Literal[False] = False,
 ) -> UpsertResult: ...
 
 
 @overload
 def upsert(
     queryset: QuerySet[_M],
-    model_objs: Iterable[_M],
+    model_objs: ModelObjsTypeDef[_M],
+    unique_fields: List[str],
+    update_fields: UpdateFieldsTypeDef = None,
+    *,
+    exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
+    returning: Union[List[str], Literal[True]],
+    returning_format: Literal["columns", "numpy"],
+    stats: Literal[False] = False,
+    ignore_unchanged: bool = False,
+    return_unchanged: bool = False,
+    set_returned: bool = False,
+    duplicates: DuplicatesTypeDef = None,
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    stream: Literal[False] = False,
+) -> UpsertColumnsResult: ...
+
+
+@overload
+def upsert(
+    queryset: QuerySet[_M],
+    model_objs: ModelObjsTypeDef[_M],
+    unique_fields: List[str],
+    update_fields: UpdateFieldsTypeDef = None,
+    *,
+    exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
+    returning: Literal[False] = False,
+    returning_format: ReturningFormatTypeDef = "rows",
+    stats: Literal[True],
+    ignore_unchanged: bool = False,
+    return_unchanged: bool = False,
+    set_returned: bool = False,
+    duplicates: DuplicatesTypeDef = None,
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    stream: Literal[False] = False,
+) -> UpsertStats: ...
+
+
+@overload
+def upsert(
+    queryset: QuerySet[_M],
+    model_objs: ModelObjsTypeDef[_M],
     unique_fields: List[str],
     update_fields: UpdateFieldsTypeDef = None,
     *,
     exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
     returning: Literal[False] = False,
+    returning_format: ReturningFormatTypeDef = "rows",
+    stats: Literal[False] = False,
     ignore_unchanged: bool = False,
+    return_unchanged: bool = False,
+    set_returned: bool = False,
+    duplicates: DuplicatesTypeDef = None,
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    stream: Literal[False] = False,
 ) -> None: ...
 
 
 @overload
 def upsert(
     queryset: QuerySet[_M],
-    model_objs: Iterable[_M],
+    model_objs: ModelObjsTypeDef[_M],
     unique_fields: List[str],
     update_fields: UpdateFieldsTypeDef = None,
     *,
     exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
     returning: Union[List[str], bool] = False,
+    returning_format: ReturningFormatTypeDef = "rows",
+    stats: bool = False,
     ignore_unchanged: bool = False,
-) -> Union[UpsertResult, None]: ...
+    return_unchanged: bool = False,
+    set_returned: bool = False,
+    duplicates: DuplicatesTypeDef = None,
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    stream: bool = False,
+) -> Union[UpsertResult, UpsertColumnsResult, UpsertStats, Iterator["Row"], None]: ...
 
 
 def upsert(
     queryset: QuerySet[_M],
-    model_objs: Iterable[_M],
+    model_objs: ModelObjsTypeDef[_M],
     unique_fields: List[str],
     update_fields: UpdateFieldsTypeDef = None,
     *,
     exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
     returning: Union[List[str], bool] = False,
+    returning_format: ReturningFormatTypeDef = "rows",
+    stats: bool = False,
     ignore_unchanged: bool = False,
-) -> Union[UpsertResult, None]:
+    return_unchanged: bool = False,
+    set_returned: bool = False,
+    duplicates: DuplicatesTypeDef = None,
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    stream: bool = False,
+) -> Union[UpsertResult, UpsertColumnsResult, UpsertStats, Iterator["Row"], None]:
     """
     Perform a bulk upsert.
 
     Args:
         queryset: A model or a queryset for the table being upserted.
         model_objs: An iterable of Django models to upsert. All models
-            in this list will be bulk upserted.
+            in this list will be bulk upserted. Rows of values can be used
+            instead of model objects. See `columns`.
         unique_fields: A list of fields that define the uniqueness
             of the model. The model must have a unique constraint on these
             fields.
         update_fields: A list of fields to update whenever objects already exist.
             If an empty list is provided, it is equivalent to doing a bulk insert on
-            the objects that don't exist. If `None`, all fields will be updated.
+            the objects that don't exist. If `None`, all fields will be updated,
+            or only the columns of rows of values other than the unique fields.
             If you want to perform an expression such as an `F` object on a field when
             it is updated, use the [pgbulk.UpdateField][] class. See examples below.
         exclude: A list of fields to exclude from the upsert. This is useful
             when `update_fields` is `None` and you want to exclude fields from
             being updated. This is additive to the `unique_fields` list.
+        columns: The fields of the values in each row when `model_objs` are
+            sequences such as tuples. Mappings of fields to values, or a mapping
+            of fields to sequences of column values, can be used without
+            `columns`. Fields that are not in the rows use their defaults.
         returning: If True, returns all fields. If a list, only returns fields
             in the list. If False, do not return results from the upsert.
+        returning_format: `"rows"` returns named tuples. `"tuples"` returns plain
+            tuples of values in the order of the returned fields, which avoids
+            the overhead of named tuples. The status of upserted tuples is their
+            last value. `"columns"` returns an `UpsertColumnsResult` of lists of
+            the values of each returned field, and `"numpy"` returns one of
+            NumPy arrays.
+        stats: If True, return an `UpsertStats` with the number of created,
+            updated, and unchanged rows. Rows are counted by Postgres without
+            returning them. Cannot be used with `returning`.
         ignore_unchanged: Ignore unchanged rows in updates.
+        return_unchanged: Also return the existing rows that were not upserted,
+            such as unchanged rows when `ignore_unchanged=True`, with a `status_`
+            of `"n"`. They are returned by the same statement as the upserted rows.
+        set_returned: Set the returned values, such as primary keys, onto the
+            model objects they were written from, like `bulk_create`. Rows are
+            matched to model objects with an `index_` of their position in
+            `model_objs` before the `status_`. Unique fields cannot be null.
+        duplicates: Collapse model objects with the same unique field values,
+            which Postgres cannot upsert in the same statement. Every object is
+            read before any are written. `"first"` writes the first object and
+            `"last"` writes the last one. A callable is called with the collapsed
+            object and the next duplicate, which are model objects or rows as
+            they were given, and returns the object or row to write. Objects
+            with null unique fields are not collapsed. If `None`, duplicates
+            raise an error from Postgres.
+        ordered: Return rows in the order of `model_objs`, with an `index_` of
+            the position of each row in `model_objs` before the `status_`. Rows
+            are matched to the first input row with their unique fields, so
+            duplicate objects are returned once. Unique fields cannot be null.
+            Streamed rows have an `index_` but are not reordered. DB defaults are
+            not supported.
+        presorted: Skip sorting the rows of each window by their unique fields
+            when `model_objs` are already sorted. Rows are written in the given
+            order, so concurrent upserts of unsorted rows are more likely to
+            deadlock.
+        prepare: Prepare statements on the server so that Postgres parses and
+            plans statements with the same shape once per connection. With the
+            `"values"` method, batches are split into batches with a power of two
+            rows so that their statements repeat. Statements are not prepared
+            with the `"copy"` method or when streaming. Requires the
+            `"prepare_threshold"` database option and psycopg3.
+        pipeline: Send the statements of every batch in a window together with
+            psycopg3 pipeline mode, waiting for one network round trip instead of
+            one for each statement. Statements are not pipelined with the `"copy"`
+            method or when streaming.
+        batch_size: The maximum number of rows in each statement. Rows are split
+            into batches that are executed in sequence in the same transaction.
+        batch_bytes: The approximate maximum size of the values in each statement,
+            in bytes. Can be combined with `batch_size`. Batches are always capped
+            at the number of query parameters Postgres allows.
+        window_size: Pull at most this many model objects from `model_objs` into
+            memory at a time. Each window is sorted and written before the next
+            is consumed, allowing iterators of any size to be written. Rows are
+            only sorted within their window.
+        method: How rows are sent to Postgres. `"values"` renders rows into the
+            statement. `"unnest"` sends each column as one array parameter, keeping
+            the statement the same size regardless of the number of rows. `"copy"`
+            copies rows into a temporary table with binary `COPY FROM` and upserts
+            from it, which is faster for large batches. Only available with psycopg3.
+            Expressions as values are only supported with `"values"`.
+        stream: Return an iterator of the upserted rows instead of an `UpsertResult`.
+            Statements run as the iterator is consumed, and the rows returned by
+            each statement are received before they are yielded, so use `batch_size`
+            to limit the rows held in memory. Statements have at most 1000 rows
+            when `batch_size` is not given. The `status_` attribute of each row
+            is `"c"` for created rows and `"u"` for updated rows. Only available
+            with psycopg3 and `returning`.
 
     Returns:
         If `returning=True`, the upserted result, an iterable list of all upsert objects.
             Use the `.updated` and `.created` attributes to iterate over created or updated
-            elements.
+            elements, and `.unchanged` for rows returned with `return_unchanged=True`.
+            With a columnar `returning_format`, these attributes are masks of the rows.
+            If `stats=True`, the counts of created, updated, and unchanged rows.
 
     Note:
-        Model signals such as `post_save` are not emitted.
+        Model signals such as `post_save` are not emitted. When streaming, rows
+        are written as the iterator is consumed, and the transaction is committed
+        once it is exhausted. Closing the iterator early rolls back the write.
     """
     queryset = queryset if isinstance(queryset, models.QuerySet) else queryset.objects.all()
-    with connections[queryset.db].cursor() as cursor:
-        return _upsert(
-            queryset,
-            model_objs,
-            unique_fields=unique_fields,
-            update_fields=update_fields,
-            returning=returning,
-            exclude=exclude,
-            ignore_unchanged=ignore_unchanged,
-            cursor=cursor,
-        )
+    make_writer = functools.partial(
+        _upsert,
+        queryset,
+        model_objs,
+        unique_fields=unique_fields,
+        update_fields=update_fields,
+        returning=returning,
+        returning_format=returning_format,
+        stats=stats,
+        exclude=exclude,
+        columns=columns,
+        ignore_unchanged=ignore_unchanged,
+        return_unchanged=return_unchanged,
+        set_returned=set_returned,
+        duplicates=duplicates,
+        ordered=ordered,
+        presorted=presorted,
+        prepare=prepare,
+        pipeline=pipeline,
+        batch_size=batch_size,
+        batch_bytes=batch_bytes,
+        window_size=window_size,
+        method=method,
+        stream=stream,
+    )
+    if stream:
+        if set_returned:
+            raise ValueError("set_returned cannot be used with stream=True.")
+
+        _check_stream(returning, returning_format)
+        return _stream_writes(queryset, make_writer)
+
+    with transaction.atomic(using=queryset.db, savepoint=False):
+        with connections[queryset.db].cursor() as cursor:
+            return _run_writer(make_writer(cursor=cursor), cursor)
 
 
 @overload
 async def aupsert(
     queryset: QuerySet[_M],
-    model_objs: Iterable[_M],
+    model_objs: ModelObjsTypeDef[_M],
     unique_fields: List[str],
     update_fields: UpdateFieldsTypeDef = None,
     *,
     exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
     returning: Union[List[str], Literal[True]],
+    returning_format: Literal["rows", "tuples"] = "rows",
+    stats: Literal[False] = False,
     ignore_unchanged: bool = False,
+    return_unchanged: bool = False,
+    set_returned: bool = False,
+    duplicates: DuplicatesTypeDef = None,
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    aconnection: Union["AsyncConnection[Any]", None] = None,
 ) -> UpsertResult: ...
 
 
 @overload
 async def aupsert(
     queryset: QuerySet[_M],
-    model_objs: Iterable[_M],
+    model_objs: ModelObjsTypeDef[_M],
     unique_fields: List[str],
     update_fields: UpdateFieldsTypeDef = None,
     *,
     exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
+    returning: Union[List[str], Literal[True]],
+    returning_format: Literal["columns", "numpy"],
+    stats: Literal[False] = False,
+    ignore_unchanged: bool = False,
+    return_unchanged: bool = False,
+    set_returned: bool = False,
+    duplicates: DuplicatesTypeDef = None,
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    aconnection: Union["AsyncConnection[Any]", None] = None,
+) -> UpsertColumnsResult: ...
+
+
+@overload
+async def aupsert(
+    queryset: QuerySet[_M],
+    model_objs: ModelObjsTypeDef[_M],
+    unique_fields: List[str],
+    update_fields: UpdateFieldsTypeDef = None,
+    *,
+    exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
     returning: Literal[False] = False,
+    returning_format: ReturningFormatTypeDef = "rows",
+    stats: Literal[True],
     ignore_unchanged: bool = False,
+    return_unchanged: bool = False,
+    set_returned: bool = False,
+    duplicates: DuplicatesTypeDef = None,
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    aconnection: Union["AsyncConnection[Any]", None] = None,
+) -> UpsertStats: ...
+
+
+@overload
+async def aupsert(
+    queryset: QuerySet[_M],
+    model_objs: ModelObjsTypeDef[_M],
+    unique_fields: List[str],
+    update_fields: UpdateFieldsTypeDef = None,
+    *,
+    exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
+    returning: Literal[False] = False,
+    returning_format: ReturningFormatTypeDef = "rows",
+    stats: Literal[False] = False,
+    ignore_unchanged: bool = False,
+    return_unchanged: bool = False,
+    set_returned: bool = False,
+    duplicates: DuplicatesTypeDef = None,
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    aconnection: Union["AsyncConnection[Any]", None] = None,
 ) -> None: ...
 
 
 @overload
 async def aupsert(
     queryset: QuerySet[_M],
-    model_objs: Iterable[_M],
+    model_objs: ModelObjsTypeDef[_M],
     unique_fields: List[str],
     update_fields: UpdateFieldsTypeDef = None,
     *,
     exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
     returning: Union[List[str], bool] = False,
+    returning_format: ReturningFormatTypeDef = "rows",
+    stats: bool = False,
     ignore_unchanged: bool = False,
-) -> Union[UpsertResult, None]: ...
+    return_unchanged: bool = False,
+    set_returned: bool = False,
+    duplicates: DuplicatesTypeDef = None,
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    aconnection: Union["AsyncConnection[Any]", None] = None,
+) -> Union[UpsertResult, UpsertColumnsResult, UpsertStats, None]: ...
 
 
 async def aupsert(
     queryset: QuerySet[_M],
-    model_objs: Iterable[_M],
+    model_objs: ModelObjsTypeDef[_M],
     unique_fields: List[str],
     update_fields: UpdateFieldsTypeDef = None,
     *,
     exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
     returning: Union[List[str], bool] = False,
+    returning_format: ReturningFormatTypeDef = "rows",
+    stats: bool = False,
     ignore_unchanged: bool = False,
-) -> Union[UpsertResult, None]:
+    return_unchanged: bool = False,
+    set_returned: bool = False,
+    duplicates: DuplicatesTypeDef = None,
+    ordered: bool = False,
+    presorted: bool = False,
+    prepare: bool = False,
+    pipeline: bool = False,
+    batch_size: Union[int, None] = None,
+    batch_bytes: Union[int, None] = None,
+    window_size: Union[int, None] = None,
+    method: WriteMethodTypeDef = "values",
+    aconnection: Union["AsyncConnection[Any]", None] = None,
+) -> Union[UpsertResult, UpsertColumnsResult, UpsertStats, None]:
     """
     Perform an asynchronous bulk upsert.
 
     See [pgbulk.upsert][]
 
+    Args:
+        aconnection: A psycopg3 `AsyncConnection`, such as one opened with
+            [pgbulk.aconnect][]. If provided, the upsert is executed natively
+            on the connection in its own transaction.
+
     Note:
-        Like other async Django ORM methods, `aupsert` currently wraps `upsert` in
-        a `sync_to_async` wrapper. It does not yet use an asynchronous database
-        driver but will in the future.
+        Like other async Django ORM methods, `aupsert` wraps `upsert` in a
+        `sync_to_async` wrapper unless `aconnection` is provided.
     """
-    return await sync_to_async(upsert)(
+    if aconnection is not None:
+        queryset = queryset if isinstance(queryset, models.QuerySet) else queryset.objects.all()
+        async with _acursor(aconnection) as cursor:
+            writer = _upsert(
+                queryset,
+                model_objs,
+                unique_fields=unique_fields,
+                update_fields=update_fields,
+                returning=returning,
+                returning_format=returning_format,
+                stats=stats,
+                exclude=exclude,
+                columns=columns,
+                ignore_unchanged=ignore_unchanged,
+                return_unchanged=return_unchanged,
+                set_returned=set_returned,
+                duplicates=duplicates,
+                ordered=ordered,
+                presorted=presorted,
+                prepare=prepare,
+                pipeline=pipeline,
+                batch_size=batch_size,
+                batch_bytes=batch_bytes,
+                window_size=window_size,
+                method=method,
+                cursor=cursor,
+            )
+            return await _arun_writer(writer, cursor)
+
+    upserted = await sync_to_async(upsert)(
         queryset,
         model_objs,
         unique_fields=unique_fields,
         update_fields=update_fields,
         returning=returning,
+        returning_format=returning_format,
+        stats=stats,
         exclude=exclude,
+        columns=columns,
         ignore_unchanged=ignore_unchanged,
+        return_unchanged=return_unchanged,
+        set_returned=set_returned,
+        duplicates=duplicates,
+        ordered=ordered,
+        presorted=presorted,
+        prepare=prepare,
+        pipeline=pipeline,
+        batch_size=batch_size,
+        batch_bytes=batch_bytes,
+        window_size=window_size,
+        method=method,
     )
+    # Rows are only streamed with stream=True
+    return cast(Union[UpsertResult, UpsertColumnsResult, UpsertStats, None], upserted)
+
+
+def _get_plan_key(queryset: models.QuerySet[_M], *args: Any) -> Union[Tuple[Any, ...], None]:
+    """
+    Return the cache key of a write plan with the given arguments.
+
+    Update fields with expressions are keyed by their expressions, which are
+    equal when they are constructed with the same arguments. `None` is returned
+    if the plan cannot be cached, which happens when an expression is not hashable.
+    """
+    key: List[Any] = [queryset.model, queryset.db]
+    for arg in args:
+        if isinstance(arg, list):
+            arg = tuple(
+                (str(f), f.expression)
+                if isinstance(f, UpdateField) and f.expression is not None
+                else f
+                for f in cast(List[Any], arg)
+            )
+
+        key.append(arg)
+
+    try:
+        hash(tuple(key))
+    except TypeError:
+        return None
+
+    return tuple(key)
+
+
+def _get_plan(key: Union[Tuple[Any, ...], None], build: Callable[[], _P]) -> _P:
+    """Return the cached write plan of a key, building it if it's not cached."""
+    if key is None:
+        return build()
+
+    try:
+        return _plans[key]
+    except KeyError:
+        plan = build()
+
+    with _plans_lock:
+        if len(_plans) >= _PLAN_CACHE_SIZE:
+            _plans.pop(next(iter(_plans)))
+
+        _plans[key] = plan
+
+    return plan
+
+
+def clear_plan_cache() -> None:
+    """
+    Clear cached write plans.
+
+    pgbulk caches the fields, types, and SQL used to write models so that
+    they are computed once. Plans are cleared after migrations. Call this
+    after changing models or database settings at runtime, such as in tests.
+    """
+    with _plans_lock:
+        _plans.clear()
+
+    _model_fields.cache_clear()
+    _compile_row_getter.cache_clear()
+
+
+def _clear_plan_cache_on_migrate(**kwargs: Any) -> None:
+    clear_plan_cache()
+
+
+post_migrate.connect(_clear_plan_cache_on_migrate, dispatch_uid="pgbulk.clear_plan_cache")
+
+
+def _check_method(method: WriteMethodTypeDef) -> None:
+    if method not in ("values", "unnest", "copy"):
+        raise ValueError(f'Invalid method "{method}". Must be "values", "unnest", or "copy".')
+
+    if method == "copy" and psycopg_maj_version == 2:  # pragma: no cover
+        raise RuntimeError('Only psycopg3 is supported for method="copy".')
+
+
+def _check_expressions(method: WriteMethodTypeDef, expression_positions: Set[int]) -> None:
+    # Expressions are rendered into the statement, so they cannot be sent as parameters
+    if expression_positions and method != "values":
+        raise ValueError(f'Expressions are only supported with method="values", not "{method}".')
+
+
+def _check_stream(
+    returning: Union[List[str], bool], returning_format: ReturningFormatTypeDef
+) -> None:
+    if psycopg_maj_version == 2:  # pragma: no cover
+        raise RuntimeError("Only psycopg3 is supported for stream=True.")
+
+    if not returning:
+        raise ValueError("returning must be provided with stream=True.")
+
+    if returning_format not in ("rows", "tuples"):
+        raise ValueError('returning_format must be "rows" or "tuples" with stream=True.')
 
 
 def _postgres_types_for_fields(
@@ -966,27 +3101,238 @@ def _postgres_types_for_fields(
     return [_simplify_type(field.db_type(connection=connection)) for field in fields]
 
 
+def _get_copy_sql(
+    table: str,
+    fields: List[AnyField],
+    *,
+    binary: bool,
+    cursor: "CursorWrapper",
+    ordered: bool = False,
+) -> str:
+    """
+    Render the COPY statement for the fields of a quoted table, followed by
+    the `index_` column if `ordered`.
+    """
+    all_field_names_sql = ", ".join(
+        [*(_quote(field.column, cursor) for field in fields), *(["index_"] if ordered else [])]
+    )
+    copy_sql = f"COPY {table} ({all_field_names_sql}) FROM STDIN"
+    if binary:
+        copy_sql += " WITH (FORMAT BINARY)"
+
+    return copy_sql
+
+
+class _CopyPlan(NamedTuple):
+    """The fields and SQL of a copy."""
+
+    fields: List[AnyField]
+    copy_sql: str
+    postgres_types: Union[List[str], None]
+
+
+def _get_copy_plan(
+    queryset: models.QuerySet[_M],
+    copy_fields: UpdateFieldsTypeDef,
+    exclude: Union[List[str], None],
+    binary: bool,
+    cursor: "CursorWrapper",
+    include_pk: bool = False,
+) -> _CopyPlan:
+    def build() -> _CopyPlan:
+        model = queryset.model
+        fields = [
+            model._meta.get_field(field)
+            for field in _filter_fields(
+                queryset, copy_fields, exclude=exclude, exclude_non_updatable=False
+            )
+        ]
+        if include_pk and model._meta.pk not in fields:
+            fields.insert(0, model._meta.pk)  # type: ignore
+        return _CopyPlan(
+            fields=fields,
+            copy_sql=_get_copy_sql(
+                _quote(model._meta.db_table, cursor), fields, binary=binary, cursor=cursor
+            ),
+            postgres_types=(
+                _postgres_types_for_fields(fields, connections[queryset.db]) if binary else None
+            ),
+        )
+
+    key = _get_plan_key(queryset, "copy", copy_fields, exclude, binary, include_pk)
+    return _get_plan(key, build)
+
+
+def _get_staging_table_sql(
+    queryset: models.QuerySet[_M],
+    fields: List[AnyField],
+    cursor: "CursorWrapper",
+    *,
+    unlogged: bool = False,
+    ordered: bool = False,
+) -> Tuple[str, str]:
+    """
+    Return the quoted name of a new temporary table with the columns of the
+    fields, along with the SQL that creates it empty. It must be dropped by the caller.
+
+    If `unlogged`, an unlogged table is created instead so that it can be
+    shared across connections. If `ordered`, the table has an `index_` column
+    after the columns of the fields.
+    """
+    staging_table = _quote(f"pgbulk_{uuid.uuid4().hex}", cursor)
+    staging_table_sql = (
+        "CREATE {kind} TABLE {staging_table} AS SELECT {cols} FROM {table} WITH NO DATA"
+    ).format(
+        kind="UNLOGGED" if unlogged else "TEMPORARY",
+        staging_table=staging_table,
+        cols=", ".join(
+            [
+                *(_quote(field.column, cursor) for field in fields),
+                *(["NULL::bigint AS index_"] if ordered else []),
+            ]
+        ),
+        table=_quote(queryset.model._meta.db_table, cursor),
+    )
+    return staging_table, staging_table_sql
+
+
+def _copy(
+    queryset: models.QuerySet[_M],
+    model_objs: ModelObjsTypeDef[_M],
+    copy_fields: UpdateFieldsTypeDef,
+    exclude: Union[List[str], None],
+    binary: bool,
+    cursor: "CursorWrapper",
+    table: Union[str, None] = None,
+    columns: Union[List[str], None] = None,
+    set_pks: bool = False,
+) -> "_Writer[None]":
+    """
+    Internal implementation of copy. Rows are copied into the quoted `table`
+    if provided instead of the table of the model.
+    """
+    # Populate automatically-generated fields in the rows like date times
+    objs, layout = _get_rows(queryset, model_objs, columns, fill_auto_fields=True)
+    if set_pks and layout is not None:
+        raise ValueError("set_pks can only be used with model objects.")
+
+    plan = _get_copy_plan(
+        queryset,
+        copy_fields=copy_fields,
+        exclude=exclude,
+        binary=binary,
+        cursor=cursor,
+        include_pk=set_pks,
+    )
+    copy_sql = (
+        plan.copy_sql
+        if table is None
+        else _get_copy_sql(table, plan.fields, binary=binary, cursor=cursor)
+    )
+    extract_row = _get_row_extractor(queryset, plan.fields, copying=True, layout=layout)
+    if not set_pks:
+        yield _CopyRows(copy_sql, postgres_types=plan.postgres_types, rows=map(extract_row, objs))
+        return
+
+    # Primary keys are allocated from the sequence of the primary key before
+    # each window of model objects is copied
+    pk_sequence_sql = "SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)"
+    table_name = _quote(queryset.model._meta.db_table, cursor)
+    pk_column = queryset.model._meta.pk.column  # type: ignore
+    for window in _windows(objs, _SET_PKS_WINDOW_SIZE):
+        missing_pks = [obj for obj in window if obj.pk is None]
+        if missing_pks:
+            pks = yield _Execute(pk_sequence_sql, [table_name, pk_column, len(missing_pks)])
+            if pks[0][0] is None:
+                raise ValueError("set_pks requires a primary key with a sequence.")
+
+            for obj, (pk,) in zip(missing_pks, pks):
+                obj.pk = pk
+
+        yield _CopyRows(
+            copy_sql, postgres_types=plan.postgres_types, rows=map(extract_row, window)
+        )
+
+        for obj in window:
+            obj._state.adding = False
+            obj._state.db = queryset.db
+
+
+async def aconnect(using: str = DEFAULT_DB_ALIAS) -> "AsyncConnection[Any]":
+    """
+    Open a psycopg3 `AsyncConnection` to a Django database.
+
+    The connection uses the same settings, adapters, and time zone as
+    Django's connection. Pass it as `aconnection` to [pgbulk.aupsert][],
+    [pgbulk.aupdate][], or [pgbulk.acopy][] to write without leaving the
+    event loop. Close the connection when finished, for example:
+
+        async with await pgbulk.aconnect() as aconnection:
+            await pgbulk.aupsert(MyModel, objs, ["key"], aconnection=aconnection)
+
+    Args:
+        using: The alias of the Django database.
+
+    Note:
+        Writes on the connection are not part of Django's transactions.
+    """
+    if psycopg_maj_version == 2:  # pragma: no cover
+        raise RuntimeError("Only psycopg3 is supported for pgbulk.aconnect.")
+
+    connection = connections[using]
+    conn_params = connection.get_connection_params()
+    conn_params.pop("cursor_factory", None)
+    aconnection = await psycopg.AsyncConnection.connect(**conn_params, autocommit=True)
+
+    timezone_name = connection.timezone_name
+    if timezone_name and aconnection.info.parameter_status("TimeZone") != timezone_name:
+        await aconnection.execute(connection.ops.set_time_zone_sql(), [timezone_name])
+
+    return aconnection
+
+
+@contextlib.asynccontextmanager
+async def _acursor(aconnection: "AsyncConnection[Any]") -> AsyncGenerator[Any, None]:
+    """Open a client-side binding cursor in a transaction of an async connection."""
+    if psycopg_maj_version == 2:  # pragma: no cover
+        raise RuntimeError("Only psycopg3 is supported for native async writes.")
+
+    async with aconnection.transaction():
+        async with psycopg.AsyncClientCursor(aconnection) as cursor:
+            yield cursor
+
+
 def copy(
     queryset: QuerySet[_M],
-    model_objs: Iterable[_M],
+    model_objs: ModelObjsTypeDef[_M],
     copy_fields: UpdateFieldsTypeDef = None,
     *,
     exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
     binary: bool = False,
+    set_pks: bool = False,
 ) -> None:
     """
     Copy data into a table.
 
     Args:
         queryset: queryset: A model or a queryset for the table being copied into.
-        model_objs: An iterable of Django models to copy.
+        model_objs: An iterable of Django models to copy. Rows of values
+            can be used instead of model objects. See `columns`.
         copy_fields: A list of fields on the model objects to copy.
             If `None`, all fields will be copied.
         exclude: A list of fields to exclude from the copy. This is useful
             when `copy_fields` is `None` and you want to exclude fields from
             being copied.
+        columns: The fields of the values in each row when `model_objs` are
+            sequences such as tuples. Mappings of fields to values, or a mapping
+            of fields to sequences of column values, can be used without
+            `columns`. Fields that are not in the rows use their defaults.
         binary: If True, copy data in binary format.
             This can yield improved performance for large datasets.
+        set_pks: Allocate primary keys from the sequence of the primary key for
+            model objects without one and set them onto the model objects before
+            copying, like `bulk_create`.
 
     Note:
         Model signals such as `post_save` are not emitted.
@@ -995,61 +3341,607 @@ def copy(
         raise RuntimeError("Only psycopg3 is supported for pgbulk.copy.")
 
     queryset = queryset if isinstance(queryset, models.QuerySet) else queryset.objects.all()
-    model = queryset.model
-
-    # Populate automatically-generated fields in the rows like date times
-    _fill_auto_fields(queryset, model_objs)
-
-    # Determine which fields should be copied
-    fields = [
-        model._meta.get_field(field)
-        for field in _filter_fields(
-            queryset, copy_fields, exclude=exclude, exclude_non_updatable=False
-        )
-    ]
-    cols = [field.column for field in fields]
 
     connection = connections[queryset.db]
-    with connection.cursor() as cursor:
-        all_field_names_sql = ", ".join([_quote(col, cursor) for col in cols])
-        copy_sql = (
-            f"COPY {_quote(model._meta.db_table, cursor)} ({all_field_names_sql}) FROM STDIN"
+    with transaction.atomic(using=queryset.db, savepoint=False), connection.cursor() as cursor:
+        writer = _copy(
+            queryset,
+            model_objs,
+            copy_fields=copy_fields,
+            exclude=exclude,
+            columns=columns,
+            binary=binary,
+            cursor=cursor,
+            set_pks=set_pks,
         )
-        if binary:
-            copy_sql += " WITH (FORMAT BINARY)"
-
-        with cursor.copy(copy_sql) as copier:  # type: ignore
-            if binary:
-                postgres_types = _postgres_types_for_fields(fields, connection)
-                copier.set_types(postgres_types)  # type: ignore
-
-            for model_obj in model_objs:
-                row = _get_values_for_row(queryset, model_obj, fields, copying=True)
-                copier.write_row(row)  # type: ignore
+        _run_writer(writer, cursor)
 
 
 async def acopy(
     queryset: QuerySet[_M],
-    model_objs: Iterable[_M],
+    model_objs: ModelObjsTypeDef[_M],
     copy_fields: UpdateFieldsTypeDef = None,
     *,
     exclude: Union[List[str], None] = None,
+    columns: Union[List[str], None] = None,
     binary: bool = False,
+    set_pks: bool = False,
+    aconnection: Union["AsyncConnection[Any]", None] = None,
 ) -> None:
     """
     Asynchronously copy data into a table.
 
     See [pgbulk.copy][]
 
+    Args:
+        aconnection: A psycopg3 `AsyncConnection`, such as one opened with
+            [pgbulk.aconnect][]. If provided, rows are copied natively
+            on the connection in its own transaction.
+
     Note:
-        Like other async Django ORM methods, `acopy` currently wraps `copy` in
-        a `sync_to_async` wrapper. It does not yet use an asynchronous database
-        driver but will in the future.
+        Like other async Django ORM methods, `acopy` wraps `copy` in a
+        `sync_to_async` wrapper unless `aconnection` is provided.
     """
+    if aconnection is not None:
+        queryset = queryset if isinstance(queryset, models.QuerySet) else queryset.objects.all()
+        async with _acursor(aconnection) as cursor:
+            writer = _copy(
+                queryset,
+                model_objs,
+                copy_fields=copy_fields,
+                exclude=exclude,
+                columns=columns,
+                binary=binary,
+                cursor=cursor,
+                set_pks=set_pks,
+            )
+            await _arun_writer(writer, cursor)
+            return
+
     return await sync_to_async(copy)(
         queryset,
         model_objs,
         copy_fields=copy_fields,
         exclude=exclude,
+        columns=columns,
         binary=binary,
+        set_pks=set_pks,
     )
+
+
+class _CopyAborted(Exception):
+    """Raised in a parallel copy worker when another worker failed."""
+
+
+def _copy_partition(
+    queryset: models.QuerySet[_M],
+    chunks: "queue.Queue[Union[List[_M], None]]",
+    *,
+    copy_fields: UpdateFieldsTypeDef,
+    exclude: Union[List[str], None],
+    binary: bool,
+    table: Union[str, None],
+    abort: threading.Event,
+) -> None:
+    """
+    Copy the chunks of model objects of a partition until `None` is received.
+
+    Rows are copied in one transaction on the connection of the current thread.
+    The copy is rolled back if `abort` is set by another thread.
+    """
+    consumed = False
+
+    def partition_objs() -> Iterator[_M]:
+        nonlocal consumed
+        for chunk in iter(chunks.get, None):
+            yield from chunk
+
+        consumed = True
+        if abort.is_set():
+            raise _CopyAborted()
+
+    try:
+        with transaction.atomic(using=queryset.db):
+            with connections[queryset.db].cursor() as cursor:
+                writer = _copy(
+                    queryset,
+                    partition_objs(),
+                    copy_fields=copy_fields,
+                    exclude=exclude,
+                    binary=binary,
+                    cursor=cursor,
+                    table=table,
+                )
+                _run_writer(writer, cursor)
+    except BaseException:
+        abort.set()
+        if not consumed:
+            # Drain the partition so that the producer is never blocked
+            for _ in iter(chunks.get, None):
+                pass
+
+        raise
+    finally:
+        connections[queryset.db].close()
+
+
+def _partition(
+    model_objs: Iterable[_M],
+    chunks: "List[queue.Queue[Union[List[_M], None]]]",
+    partition_key: Union[Callable[[_M], Any], None],
+    abort: threading.Event,
+) -> None:
+    """Send model objects in chunks to partitions, stopping early if aborted."""
+    partitions: List[List[_M]] = [[] for _ in chunks]
+    try:
+        for i, model_obj in enumerate(model_objs):
+            if abort.is_set():
+                break
+
+            n = hash(partition_key(model_obj)) if partition_key else i
+            partition = partitions[n % len(chunks)]
+            partition.append(model_obj)
+            if len(partition) >= _PARALLEL_COPY_CHUNK_SIZE:
+                chunks[n % len(chunks)].put(partition[:])
+                partition.clear()
+    except BaseException:
+        abort.set()
+        raise
+    finally:
+        for partition_chunks, partition in zip(chunks, partitions):
+            if partition and not abort.is_set():
+                partition_chunks.put(partition)
+
+            partition_chunks.put(None)
+
+
+def parallel_copy(
+    queryset: QuerySet[_M],
+    model_objs: Iterable[_M],
+    copy_fields: UpdateFieldsTypeDef = None,
+    *,
+    exclude: Union[List[str], None] = None,
+    binary: bool = False,
+    workers: int = 4,
+    partition_key: Union[Callable[[_M], Any], None] = None,
+    atomic: bool = False,
+) -> None:
+    """
+    Copy data into a table over multiple connections in parallel.
+
+    Model objects are partitioned across `workers` threads. Each thread copies
+    its partition with one `COPY FROM` statement on its own database connection.
+
+    Args:
+        queryset: A model or a queryset for the table being copied into.
+        model_objs: An iterable of Django models to copy. It is consumed
+            as rows are copied.
+        copy_fields: A list of fields on the model objects to copy.
+            If `None`, all fields will be copied.
+        exclude: A list of fields to exclude from the copy.
+        binary: If True, copy data in binary format.
+        workers: The number of threads and connections used to copy.
+        partition_key: A function of a model object. Model objects with equal
+            keys are copied by the same connection. If `None`, model objects
+            are distributed round-robin.
+        atomic: If True, rows are copied into a shared unlogged table and
+            inserted into the table in one transaction, so that either all
+            rows are copied or none are. Otherwise each connection commits
+            its partition separately, and partitions that finished before an
+            error are kept.
+
+    Note:
+        Connections are committed separately, so `parallel_copy` cannot be used
+        in a transaction. Model signals such as `post_save` are not emitted.
+    """
+    if psycopg_maj_version == 2:  # pragma: no cover
+        raise RuntimeError("Only psycopg3 is supported for pgbulk.parallel_copy.")
+
+    if workers < 1:
+        raise ValueError("workers must be a positive integer.")
+
+    queryset = queryset if isinstance(queryset, models.QuerySet) else queryset.objects.all()
+    connection = connections[queryset.db]
+    if connection.in_atomic_block:
+        raise RuntimeError("pgbulk.parallel_copy cannot be used in a transaction.")
+
+    staging_table: Union[str, None] = None
+    insert_sql: Union[str, None] = None
+    if atomic:
+        with connection.cursor() as cursor:
+            plan = _get_copy_plan(
+                queryset, copy_fields=copy_fields, exclude=exclude, binary=binary, cursor=cursor
+            )
+            staging_table, staging_table_sql = _get_staging_table_sql(
+                queryset, plan.fields, cursor, unlogged=True
+            )
+            cursor.execute(staging_table_sql)
+            cols_sql = ", ".join(_quote(field.column, cursor) for field in plan.fields)
+            insert_sql = "INSERT INTO {table} ({cols}) SELECT {cols} FROM {staging_table}".format(
+                table=_quote(queryset.model._meta.db_table, cursor),
+                cols=cols_sql,
+                staging_table=staging_table,
+            )
+
+    try:
+        chunks: "List[queue.Queue[Union[List[_M], None]]]" = [
+            queue.Queue(maxsize=_PARALLEL_COPY_QUEUE_SIZE) for _ in range(workers)
+        ]
+        abort = threading.Event()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pgbulk") as executor:
+            futures = [
+                executor.submit(
+                    _copy_partition,
+                    queryset,
+                    partition_chunks,
+                    copy_fields=copy_fields,
+                    exclude=exclude,
+                    binary=binary,
+                    table=staging_table,
+                    abort=abort,
+                )
+                for partition_chunks in chunks
+            ]
+            _partition(model_objs, chunks, partition_key, abort=abort)
+
+        # Raise the error that aborted the copy instead of errors from aborted workers
+        for future in futures:
+            if not isinstance(future.exception(), _CopyAborted):
+                future.result()
+
+        if insert_sql:
+            with transaction.atomic(using=queryset.db):
+                with connection.cursor() as cursor:
+                    cursor.execute(insert_sql)
+    finally:
+        if staging_table:
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE {staging_table}")
+
+
+class BulkWriter(Generic[_M]):
+    """
+    Buffers model objects and writes them in bulk, reducing the overhead of
+    writing a few objects at a time.
+
+    Objects are upserted with [pgbulk.upsert][] if `unique_fields` are provided
+    and copied with [pgbulk.copy][] otherwise. Buffered objects are written when
+    one of the limits is reached, when `flush` is called, and when leaving the
+    writer as a context manager without an error. For example:
+
+        with pgbulk.BulkWriter(MyModel, ["some_key"], ["some_attr"]) as writer:
+            for message in consumer:
+                writer.add(MyModel(some_key=message.key, some_attr=message.value))
+
+    Args:
+        queryset: A model or a queryset for the table being written.
+        unique_fields: The unique fields of the upsert. Objects with the same
+            unique field values are deduplicated, keeping the last added object.
+            If `None`, objects are copied without deduplication.
+        update_fields: The fields to update when upserting. See [pgbulk.upsert][].
+        max_rows: Write buffered objects once there are this many.
+        max_bytes: Write buffered objects once their values are approximately
+            this many bytes.
+        max_age: Write buffered objects when an object is added more than this
+            many seconds after the oldest buffered object was added.
+        **write_kwargs: Other arguments for [pgbulk.upsert][] or [pgbulk.copy][],
+            which are checked when the writer is created. Results of writes are
+            not returned, so `returning`, `stats`, and `stream` cannot be used.
+
+    Note:
+        Objects are only written when they are added or flushed. The writer is
+        not thread-safe.
+    """
+
+    def __init__(
+        self,
+        queryset: QuerySet[_M],
+        unique_fields: Union[List[str], None] = None,
+        update_fields: UpdateFieldsTypeDef = None,
+        *,
+        max_rows: Union[int, None] = 1_000,
+        max_bytes: Union[int, None] = None,
+        max_age: Union[float, None] = None,
+        **write_kwargs: Any,
+    ) -> None:
+        if unique_fields is None and update_fields is not None:
+            raise ValueError("update_fields can only be provided with unique_fields.")
+        if max_rows is not None and max_rows < 1:
+            raise ValueError("max_rows must be a positive integer.")
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError("max_bytes must be a positive integer.")
+        if max_age is not None and max_age <= 0:
+            raise ValueError("max_age must be a positive number.")
+
+        # Arguments are checked now rather than when the first objects are written
+        no_objs: List[_M] = []
+        if unique_fields is not None:
+            write, write_args = upsert, [queryset, no_objs, unique_fields, update_fields]
+        else:
+            write, write_args = copy, [queryset, no_objs]
+
+        try:
+            inspect.signature(write).bind_partial(*write_args, **write_kwargs)
+        except TypeError as exc:
+            raise TypeError(f"Invalid argument for pgbulk.{write.__name__}: {exc}") from None
+
+        for name in ("returning", "stats", "stream"):
+            if write_kwargs.get(name):
+                raise ValueError(f"{name} cannot be used with a bulk writer.")
+
+        self.queryset = (
+            queryset if isinstance(queryset, models.QuerySet) else queryset.objects.all()
+        )
+        self.unique_fields = unique_fields
+        self.update_fields = update_fields
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.write_kwargs = write_kwargs
+        self.num_written = 0
+
+        # Copied objects are not deduplicated, so each one has its own key
+        model = self.queryset.model
+        counter = itertools.count()
+        self._get_key: Callable[[_M], Any] = (
+            _tuple_getter(
+                operator.attrgetter, [model._meta.get_field(f).attname for f in unique_fields]
+            )
+            if unique_fields is not None
+            else lambda model_obj: next(counter)
+        )
+        self._get_values = _get_row_getter(list(_model_fields(model)), None)
+        self._objs: Dict[Any, _M] = {}
+        self._num_bytes = 0
+        self._oldest: Union[float, None] = None
+
+    def __len__(self) -> int:
+        return len(self._objs)
+
+    def __enter__(self) -> "BulkWriter[_M]":
+        return self
+
+    def __exit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> None:
+        if exc_type is None:
+            self.flush()
+
+    def _size(self, model_obj: _M) -> int:
+        return _estimate_row_size(list(self._get_values(model_obj)))
+
+    def add(self, model_obj: _M) -> None:
+        """
+        Buffer a model object, writing the buffered objects if a limit is reached.
+
+        Args:
+            model_obj: The model object to write.
+        """
+        key = self._get_key(model_obj)
+        if self.max_bytes:
+            if key in self._objs:
+                self._num_bytes -= self._size(self._objs[key])
+
+            self._num_bytes += self._size(model_obj)
+
+        self._objs[key] = model_obj
+        now = time.monotonic()
+        if self._oldest is None:
+            self._oldest = now
+
+        if (
+            (self.max_rows and len(self._objs) >= self.max_rows)
+            or (self.max_bytes and self._num_bytes >= self.max_bytes)
+            or (self.max_age and now - self._oldest >= self.max_age)
+        ):
+            self._write_buffer()
+
+    def flush(self) -> None:
+        """Write the buffered model objects."""
+        self._write_buffer()
+
+    def _write_buffer(self) -> None:
+        if not self._objs:
+            return
+
+        model_objs = list(self._objs.values())
+        if self.unique_fields is not None:
+            upsert(
+                self.queryset,
+                model_objs,
+                self.unique_fields,
+                self.update_fields,
+                **self.write_kwargs,
+            )
+        else:
+            copy(self.queryset, model_objs, **self.write_kwargs)
+
+        self.num_written += len(model_objs)
+        self._objs = {}
+        self._num_bytes = 0
+        self._oldest = None
+
+
+class _FlushRequest(NamedTuple):
+    """Asks the thread of a background writer to write its buffer and set `done`."""
+
+    done: threading.Event
+    stop: bool
+
+
+class BackgroundBulkWriter(BulkWriter[_M]):
+    """
+    A [pgbulk.BulkWriter][] that writes in a background thread with its own
+    database connection.
+
+    Added objects are put in a bounded queue and `add` returns immediately.
+    The thread buffers objects from the queue and writes them in bulk when a
+    limit of the writer is reached. Call `flush` to wait until every added
+    object is written, and `close` to write them and stop the thread. For example:
+
+        writer = pgbulk.BackgroundBulkWriter(MyModel, ["some_key"], max_age=1)
+
+        # In request handlers of any thread
+        writer.add(MyModel(some_key="a"))
+
+        # At shutdown
+        writer.close()
+
+    Args:
+        queryset: A model or a queryset for the table being written.
+        unique_fields: See [pgbulk.BulkWriter][].
+        update_fields: See [pgbulk.BulkWriter][].
+        queue_size: The maximum number of objects waiting in the queue.
+        drop: If True, objects are dropped when the queue is full and counted
+            in `num_dropped`. Otherwise `add` blocks until there is room.
+        **kwargs: Other arguments for [pgbulk.BulkWriter][].
+
+    Note:
+        Writes are committed on the connection of the thread, so they are not
+        part of the transaction of the caller. If a write fails, later objects
+        are discarded and the error is raised by the next call to `add`, `flush`,
+        or `close`. If the thread stops because of any other error, these calls
+        raise it instead of waiting for the thread. Leaving the writer as a
+        context manager closes it.
+    """
+
+    def __init__(
+        self,
+        queryset: QuerySet[_M],
+        unique_fields: Union[List[str], None] = None,
+        update_fields: UpdateFieldsTypeDef = None,
+        *,
+        queue_size: int = 10_000,
+        drop: bool = False,
+        **kwargs: Any,
+    ) -> None:
+        if queue_size < 1:
+            raise ValueError("queue_size must be a positive integer.")
+
+        super().__init__(queryset, unique_fields, update_fields, **kwargs)
+        self.drop = drop
+        self.num_dropped = 0
+        self._queue: "queue.Queue[Union[_M, _FlushRequest]]" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._error: Union[BaseException, None] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="pgbulk", daemon=True)
+        self._thread.start()
+
+    def __len__(self) -> int:
+        return self._queue.qsize() + len(self._objs)
+
+    def __exit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> None:
+        self.close()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def _write(self, write: Callable[..., None], *args: Any) -> None:
+        """Write with a method of the buffer unless an earlier write failed."""
+        if self._error is None:
+            try:
+                write(*args)
+            except Exception as exc:
+                self._error = exc
+
+    def _run(self) -> None:
+        try:
+            self._serve()
+        except BaseException as exc:
+            # Callers waiting on the stopped thread raise the error
+            self._error = self._error or exc
+        finally:
+            connections[self.queryset.db].close()
+
+    def _serve(self) -> None:
+        while True:
+            # Wake up to write the buffer once its oldest object is too old
+            timeout = None
+            if self.max_age and self._oldest is not None:
+                timeout = max(self._oldest + self.max_age - time.monotonic(), 0)
+
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._write(super()._write_buffer)
+                continue
+
+            if isinstance(item, _FlushRequest):
+                self._write(super()._write_buffer)
+                item.done.set()
+                if item.stop:
+                    return
+            else:
+                self._write(super().add, item)
+
+    def add(self, model_obj: _M) -> None:
+        """
+        Queue a model object to be written by the background thread.
+
+        Args:
+            model_obj: The model object to write.
+        """
+        # Objects are queued under the lock of `close` so that none are queued
+        # after the thread is asked to stop
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The writer is closed.")
+
+            self._raise_error()
+            try:
+                self._put(model_obj, block=not self.drop)
+            except queue.Full:
+                self.num_dropped += 1
+
+    def _put(self, item: Union[_M, "_FlushRequest"], block: bool) -> None:
+        """Put an item in the queue, waiting for room while the thread is running."""
+        while True:
+            try:
+                self._queue.put(item, block=block, timeout=_BACKGROUND_POLL_INTERVAL)
+                return
+            except queue.Full:
+                if not block:
+                    raise
+
+                self._check_running()
+
+    def _check_running(self) -> None:
+        if not self._thread.is_alive():
+            self._raise_error()
+            raise RuntimeError(  # pragma: no cover - the thread records why it stopped
+                "The background thread of the writer has stopped."
+            )
+
+    def _request_flush(self, stop: bool) -> threading.Event:
+        """Queue a request to write the buffer. Called with the lock held."""
+        done = threading.Event()
+        self._put(_FlushRequest(done, stop=stop), block=True)
+        return done
+
+    def _wait(self, done: threading.Event) -> None:
+        """Wait until a request is done, unless the thread stops before it."""
+        while not done.wait(_BACKGROUND_POLL_INTERVAL):
+            self._check_running()
+
+    def flush(self) -> None:
+        """Wait until every object added before the call is written."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The writer is closed.")
+
+            done = self._request_flush(stop=False)
+
+        self._wait(done)
+        self._raise_error()
+
+    def close(self) -> None:
+        """Write the remaining objects and stop the background thread."""
+        with self._lock:
+            done = None if self._closed else self._request_flush(stop=True)
+            self._closed = True
+
+        if done is not None:
+            self._wait(done)
+
+        self._thread.join()
+        self._raise_error()
@@ -1,16 +1,23 @@
+import asyncio
 import datetime as dt
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import ddf
 import freezegun
+import numpy as np
 import pytest
 from asgiref.sync import async_to_sync
 from django import __version__ as DJANGO_VERSION
-from django.db import transaction
-from django.db.models import F
+from django.core.exceptions import ImproperlyConfigured
+from django.db import ProgrammingError, connection, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Lower, Upper
+from django.test.utils import CaptureQueriesContext
 from pytz import timezone
 
 import pgbulk
-from pgbulk.core import psycopg_maj_version
+from pgbulk.core import _plans, psycopg_maj_version
 from pgbulk.tests import models
 
 
@@ -846,6 +853,53 @@ def test_update_foreign_key_pk():
     assert models.TestPkForeignKey.objects.filter(char_field="hello", my_key=t.my_key).exists()
 
 
+@pytest.mark.django_db
+def test_upsert_foreign_key_pk():
+    """
+    Tests a bulk upsert on a model that has a primary key to a foreign key,
+    using the name of the foreign key as the unique field
+    """
+    t = ddf.G(models.TestPkForeignKey, char_field="hi")
+    other = ddf.G(models.TestModel)
+    pgbulk.upsert(
+        models.TestPkForeignKey,
+        [
+            models.TestPkForeignKey(my_key=other, char_field="new"),
+            models.TestPkForeignKey(my_key=t.my_key, char_field="hello"),
+            models.TestPkForeignKey(my_key=t.my_key, char_field="again"),
+        ],
+        ["my_key"],
+        ["char_field"],
+        duplicates="last",
+    )
+    assert dict(models.TestPkForeignKey.objects.values_list("my_key", "char_field")) == {
+        t.my_key_id: "again",
+        other.id: "new",
+    }
+
+
+@pytest.mark.django_db
+def test_upsert_null_unique_field():
+    """
+    Tests sorting rows when the values of a single unique field are null
+    """
+    pgbulk.upsert(
+        models.TestModel,
+        [
+            models.TestModel(char_field="a"),
+            models.TestModel(int_field=1, char_field="b"),
+            models.TestModel(char_field="c"),
+        ],
+        ["int_field"],
+        ["char_field"],
+    )
+    assert sorted(models.TestModel.objects.values_list("char_field", flat=True)) == [
+        "a",
+        "b",
+        "c",
+    ]
+
+
 @pytest.mark.django_db
 def test_update_char_pk():
     """
@@ -1191,6 +1245,495 @@ def test_update_objects_with_excluded_fields():
     assert test_obj_2.array_field == ["three", "four"]
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "batch_kwargs, num_statements",
+    [
+        ({}, 1),
+        ({"batch_size": 2}, 3),
+        ({"batch_size": 5}, 1),
+        ({"batch_bytes": 1}, 5),
+        ({"batch_size": 3, "batch_bytes": 10_000}, 2),
+    ],
+)
+def test_upsert_batches(batch_kwargs, num_statements):
+    """
+    Tests upserting rows in multiple batches
+    """
+    models.TestModel.objects.create(int_field=1, float_field=0)
+
+    with CaptureQueriesContext(connection) as queries:
+        results = pgbulk.upsert(
+            models.TestModel,
+            [models.TestModel(int_field=i, float_field=i) for i in range(5)],
+            ["int_field"],
+            ["float_field"],
+            returning=True,
+            **batch_kwargs,
+        )
+
+    assert len([q for q in queries if "INSERT INTO" in q["sql"]]) == num_statements
+    assert len(results) == 5
+    assert {r.int_field for r in results.created} == {0, 2, 3, 4}
+    assert {r.int_field for r in results.updated} == {1}
+    assert set(models.TestModel.objects.values_list("int_field", "float_field")) == {
+        (i, i) for i in range(5)
+    }
+
+
+@pytest.mark.django_db
+def test_upsert_batches_max_query_params():
+    """
+    Tests that batches never exceed the maximum number of query parameters
+    """
+    num_rows = 25_000  # Three columns per row go over the limit
+    results = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        [models.TestFuncFieldModel(my_key=str(i), int_val=i) for i in range(num_rows)],
+        ["my_key"],
+        returning=["id"],
+    )
+
+    assert len(results.created) == num_rows
+    assert models.TestFuncFieldModel.objects.count() == num_rows
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("batch_kwargs", [{"batch_size": 0}, {"batch_bytes": -1}])
+def test_upsert_batches_invalid(batch_kwargs):
+    """
+    Tests invalid batch arguments
+    """
+    with pytest.raises(ValueError, match="must be a positive integer"):
+        pgbulk.upsert(
+            models.TestModel,
+            [models.TestModel(int_field=1)],
+            ["int_field"],
+            **batch_kwargs,
+        )
+
+
+def test_batch_rows_empty():
+    """
+    Tests that no batches are created when there are no rows
+    """
+    assert not list(pgbulk.core._batch_rows([], batch_size=None, batch_bytes=None))
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        {"id": 1, "int_field": 1, "char_field": "a", "float_field": 1.5},
+        {"id": None, "int_field": None, "char_field": None, "float_field": None},
+        {"id": "1", "int_field": "1", "char_field": 1, "float_field": 1},
+        {"id": 1, "int_field": True, "char_field": "a", "float_field": "1.5"},
+        {"int_field": 1, "json_field": {"a": 1}, "time_zone": timezone("UTC")},
+    ],
+)
+def test_row_extractor(values):
+    """
+    Tests that extracted rows match the values saved by Django
+    """
+    fields = [models.TestModel._meta.get_field(field) for field in values]
+    extract_row = pgbulk.core._get_row_extractor(models.TestModel.objects.all(), fields)
+    row = extract_row(models.TestModel(**values))
+    expected = [field.get_db_prep_save(values[field.name], connection) for field in fields]
+    assert [type(val) for val in row] == [type(val) for val in expected]
+
+    # JSON values are wrapped in adapters of psycopg3 or psycopg2
+    def unwrap(val):
+        return getattr(val, "obj", getattr(val, "adapted", val))
+
+    assert [unwrap(val) for val in row] == [unwrap(val) for val in expected]
+
+
+@pytest.mark.django_db
+def test_update_batches():
+    """
+    Tests updating rows in multiple batches
+    """
+    objs = [models.TestModel.objects.create(int_field=i) for i in range(5)]
+    for obj in objs:
+        obj.float_field = obj.int_field * 10
+
+    with CaptureQueriesContext(connection) as queries:
+        results = pgbulk.update(
+            models.TestModel, objs, ["float_field"], returning=["float_field"], batch_size=2
+        )
+
+    assert len([q for q in queries if q["sql"].startswith("UPDATE")]) == 3
+    assert sorted(r.float_field for r in results) == [0, 10, 20, 30, 40]
+    assert set(models.TestModel.objects.values_list("int_field", "float_field")) == {
+        (i, i * 10) for i in range(5)
+    }
+
+
+@pytest.mark.django_db
+def test_upsert_window_size():
+    """
+    Tests upserting from a generator in windows
+    """
+    consumed = []
+
+    def _objs():
+        for i in range(5):
+            consumed.append(i)
+            yield models.TestModel(int_field=i, float_field=i)
+
+    statements = []
+
+    def _record(execute, sql, params, many, context):
+        # Record how much of the generator was consumed before each statement
+        statements.append(len(consumed))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(_record):
+        results = pgbulk.upsert(
+            models.TestModel,
+            _objs(),
+            ["int_field"],
+            ["float_field"],
+            returning=True,
+            window_size=2,
+        )
+
+    assert statements == [2, 4, 5]
+    assert len(results.created) == 5
+    assert set(models.TestModel.objects.values_list("int_field", flat=True)) == set(range(5))
+
+
+@pytest.mark.django_db
+def test_update_window_size():
+    """
+    Tests updating from a generator in windows
+    """
+    objs = [models.TestModel.objects.create(int_field=i) for i in range(5)]
+    for obj in objs:
+        obj.float_field = obj.int_field * 10
+
+    with CaptureQueriesContext(connection) as queries:
+        results = pgbulk.update(
+            models.TestModel,
+            (obj for obj in objs),
+            ["float_field"],
+            returning=True,
+            window_size=3,
+            batch_size=2,
+        )
+
+    assert len([q for q in queries if q["sql"].startswith("UPDATE")]) == 3
+    assert len(results) == 5
+    assert set(models.TestModel.objects.values_list("int_field", "float_field")) == {
+        (i, i * 10) for i in range(5)
+    }
+    assert pgbulk.update(models.TestModel, iter([]), ["float_field"], window_size=3) is None
+
+    with pytest.raises(ValueError, match="must be a positive integer"):
+        pgbulk.update(models.TestModel, objs, ["float_field"], window_size=0)
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db
+@pytest.mark.parametrize("batch_size", [None, 2])
+def test_upsert_copy_method(batch_size):
+    """
+    Tests upserting with a staging table loaded with COPY
+    """
+    models.TestModel.objects.create(int_field=1, char_field="1", float_field=1)
+    models.TestModel.objects.create(int_field=2, char_field="2", float_field=2)
+
+    results = pgbulk.upsert(
+        models.TestModel,
+        [
+            models.TestModel(int_field=1, char_field="1", float_field=1, json_field={"a": 1}),
+            models.TestModel(int_field=2, char_field="2", float_field=3),
+            models.TestModel(int_field=3, char_field="3", float_field=3, array_field=["a"]),
+        ],
+        ["int_field"],
+        ["char_field", "float_field"],
+        returning=True,
+        ignore_unchanged=True,
+        method="copy",
+        batch_size=batch_size,
+    )
+
+    assert {r.int_field for r in results.created} == {3}
+    assert {r.int_field for r in results.updated} == {2}
+    assert set(models.TestModel.objects.values_list("int_field", "float_field")) == {
+        (1, 1),
+        (2, 3),
+        (3, 3),
+    }
+    assert models.TestModel.objects.get(int_field=3).array_field == ["a"]
+
+    # The staging table is dropped after the upsert
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM pg_class WHERE relname LIKE 'pgbulk_%%'")
+        assert cursor.fetchone()[0] == 0
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db
+def test_upsert_copy_method_expressions():
+    """
+    Tests upserting with update expressions using the COPY method
+    """
+    models.TestFuncFieldModel.objects.create(my_key="a", int_val=0)
+    pgbulk.upsert(
+        models.TestFuncFieldModel,
+        [
+            models.TestFuncFieldModel(my_key="a", int_val=0),
+            models.TestFuncFieldModel(my_key="b", int_val=5),
+        ],
+        ["my_key"],
+        [pgbulk.UpdateField("int_val", expression=F("int_val") + 1)],
+        method="copy",
+    )
+
+    assert dict(models.TestFuncFieldModel.objects.values_list("my_key", "int_val")) == {
+        "a": 1,
+        "b": 5,
+    }
+
+
+@pytest.mark.django_db
+def test_upsert_invalid_method():
+    """
+    Tests upserting with an invalid method
+    """
+    with pytest.raises(ValueError, match="Invalid method"):
+        pgbulk.upsert(models.TestModel, [], ["int_field"], method="invalid")
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db
+@pytest.mark.parametrize("batch_size", [None, 2])
+def test_update_copy_method(batch_size):
+    """
+    Tests updating with a staging table loaded with COPY
+    """
+    objs = [models.TestModel.objects.create(int_field=i, float_field=i) for i in range(3)]
+    objs[0].char_field = "0"
+    objs[1].char_field = "1"
+    objs[1].float_field = 10
+    objs[2].time_zone = timezone("America/Chicago")
+
+    results = pgbulk.update(
+        models.TestModel,
+        objs,
+        ["char_field", "float_field", "time_zone"],
+        returning=["int_field"],
+        ignore_unchanged=True,
+        method="copy",
+        batch_size=batch_size,
+    )
+
+    assert sorted(r.int_field for r in results) == [0, 1, 2]
+    assert set(models.TestModel.objects.values_list("int_field", "char_field", "float_field")) == {
+        (0, "0", 0),
+        (1, "1", 10),
+        (2, None, 2),
+    }
+    assert models.TestModel.objects.get(int_field=2).time_zone == timezone("America/Chicago")
+
+    # Unchanged rows are ignored
+    results = pgbulk.update(
+        models.TestModel,
+        objs,
+        ["char_field", "float_field"],
+        returning=True,
+        ignore_unchanged=True,
+        method="copy",
+    )
+    assert not results
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db
+def test_update_copy_method_expressions():
+    """
+    Tests updating with expressions using the COPY method
+    """
+    obj = models.TestFuncFieldModel.objects.create(my_key="a", int_val=1)
+    pgbulk.update(
+        models.TestFuncFieldModel,
+        [obj],
+        [pgbulk.UpdateField("int_val", expression=F("int_val") + 1)],
+        method="copy",
+    )
+
+    assert models.TestFuncFieldModel.objects.get().int_val == 2
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("batch_size", [None, 2])
+def test_upsert_unnest_method(batch_size):
+    """
+    Tests upserting rows expanded from array parameters
+    """
+    models.TestUniqueTzModel.objects.create(int_field=1, char_field="1", time_zone="UTC")
+
+    results = pgbulk.upsert(
+        models.TestUniqueTzModel,
+        [
+            models.TestUniqueTzModel(int_field=1, char_field="1", time_zone="UTC"),
+            models.TestUniqueTzModel(int_field=2, time_zone="America/Chicago"),
+            models.TestUniqueTzModel(int_field=3, float_field=3, time_zone="Europe/Paris"),
+        ],
+        ["time_zone"],
+        ["int_field", "char_field", "float_field"],
+        returning=True,
+        ignore_unchanged=True,
+        method="unnest",
+        batch_size=batch_size,
+    )
+
+    assert {r.int_field for r in results.created} == {2, 3}
+    assert not results.updated
+    assert set(
+        models.TestUniqueTzModel.objects.values_list("int_field", "char_field", "float_field")
+    ) == {(1, "1", None), (2, None, None), (3, None, 3)}
+
+    pgbulk.upsert(
+        models.TestFuncFieldModel,
+        [models.TestFuncFieldModel(my_key="a", int_val=1)] * 2,
+        ["my_key"],
+        [pgbulk.UpdateField("int_val", expression=F("int_val") + 1)],
+        method="unnest",
+        batch_size=1,
+    )
+    assert models.TestFuncFieldModel.objects.get().int_val == 2
+
+
+@pytest.mark.django_db
+def test_upsert_unnest_method_array_field():
+    """
+    Array fields cannot be expanded with unnest
+    """
+    with pytest.raises(ValueError, match='Array field "array_field" is not supported'):
+        pgbulk.upsert(
+            models.TestModel, [models.TestModel(int_field=1)], ["int_field"], method="unnest"
+        )
+
+
+@pytest.mark.django_db
+def test_upsert_plan_cache():
+    """
+    Upsert plans are cached per model and arguments and can be cleared
+    """
+    pgbulk.clear_plan_cache()
+    pgbulk.upsert(models.TestModel, [models.TestModel(int_field=1)], ["int_field"], ["char_field"])
+    assert len(_plans) == 1
+
+    # The same arguments reuse the cached plan
+    results = pgbulk.upsert(
+        models.TestModel,
+        [models.TestModel(int_field=1, char_field="a"), models.TestModel(int_field=2)],
+        ["int_field"],
+        ["char_field"],
+        returning=True,
+    )
+    assert len(_plans) == 2
+    pgbulk.upsert(models.TestModel, [models.TestModel(int_field=3)], ["int_field"], ["char_field"])
+    assert len(_plans) == 2
+    assert len(results.created) == 1
+    assert len(results.updated) == 1
+    assert models.TestModel.objects.get(int_field=1).char_field == "a"
+
+    # Expressions are cached by the arguments they are constructed with
+    for expression in [F("int_field") + 1, F("int_field") + 1, F("int_field") + 2]:
+        pgbulk.upsert(
+            models.TestModel,
+            [models.TestModel(int_field=1)],
+            ["int_field"],
+            [pgbulk.UpdateField("float_field", expression=expression)],
+        )
+    assert len(_plans) == 4
+    assert models.TestModel.objects.get(int_field=1).float_field == 3
+
+    # Plans with expressions that are not hashable are not cached
+    class UnhashableF(F):
+        __hash__ = None
+
+    pgbulk.upsert(
+        models.TestModel,
+        [models.TestModel(int_field=1)],
+        ["int_field"],
+        [pgbulk.UpdateField("float_field", expression=UnhashableF("int_field"))],
+    )
+    assert len(_plans) == 4
+    assert models.TestModel.objects.get(int_field=1).float_field == 1
+
+    pgbulk.clear_plan_cache()
+    assert not _plans
+
+
+@pytest.mark.django_db
+def test_plan_cache_size(monkeypatch):
+    """
+    The oldest plans are evicted when the cache is full
+    """
+    pgbulk.clear_plan_cache()
+    monkeypatch.setattr("pgbulk.core._PLAN_CACHE_SIZE", 1)
+    pgbulk.upsert(models.TestModel, [models.TestModel(int_field=1)], ["int_field"], ["char_field"])
+    pgbulk.upsert(
+        models.TestModel, [models.TestModel(int_field=1)], ["int_field"], ["float_field"]
+    )
+    assert [key[:5] for key in _plans] == [
+        (models.TestModel, "default", "upsert", ("int_field",), ("float_field",))
+    ]
+
+
+@pytest.mark.django_db
+def test_update_plan_cache():
+    """
+    Update plans are cached, including updates without any fields
+    """
+    pgbulk.clear_plan_cache()
+    objs = [models.TestModel.objects.create(int_field=i) for i in range(2)]
+    for obj in objs:
+        obj.char_field = str(obj.int_field)
+
+    pgbulk.update(models.TestModel, objs, ["char_field"])
+    pgbulk.update(models.TestModel, objs, ["char_field"])
+    assert pgbulk.update(models.TestModel, objs, ["id"]) is None
+    assert pgbulk.update(models.TestModel, objs, ["id"]) is None
+    assert len(_plans) == 2
+    assert list(
+        models.TestModel.objects.order_by("int_field").values_list("char_field", flat=True)
+    ) == [
+        "0",
+        "1",
+    ]
+
+
+@pytest.mark.django_db
+def test_update_unnest_method():
+    """
+    Tests updating rows expanded from array parameters
+    """
+    objs = [models.TestModel.objects.create(int_field=i, float_field=i) for i in range(3)]
+    objs[0].char_field = "0"
+    objs[1].float_field = None
+    objs[2].time_zone = timezone("America/Chicago")
+
+    results = pgbulk.update(
+        models.TestModel,
+        objs,
+        ["char_field", "float_field", "time_zone"],
+        returning=["int_field"],
+        method="unnest",
+    )
+
+    assert sorted(r.int_field for r in results) == [0, 1, 2]
+    assert set(models.TestModel.objects.values_list("int_field", "char_field", "float_field")) == {
+        (0, "0", 0),
+        (1, None, None),
+        (2, None, 2),
+    }
+    assert models.TestModel.objects.get(int_field=2).time_zone == timezone("America/Chicago")
+
+
 @pytest.mark.django_db
 def test_aupsert():
     """
@@ -1290,21 +1833,144 @@ def test_copy_with_fields(binary: bool):
 
 @pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
 @pytest.mark.django_db
-@pytest.mark.parametrize("binary", [True, False])
-def test_acopy(binary: bool):
+def test_copy_generator_auto_fields():
     """
-    Basic test for async copy
+    Tests that copying from a generator with auto fields writes every row
     """
+    pgbulk.copy(
+        models.TestAutoDateTimeModel,
+        (models.TestAutoDateTimeModel(int_field=i) for i in range(3)),
+    )
 
-    async def _run_acopy():
-        return await pgbulk.acopy(
-            models.TestModel,
-            [
-                models.TestModel(int_field=1),
-                models.TestModel(int_field=3),
-                models.TestModel(int_field=4),
-            ],
-            binary=binary,
+    assert models.TestAutoDateTimeModel.objects.count() == 3
+    assert not models.TestAutoDateTimeModel.objects.filter(auto_now_field__isnull=True).exists()
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("method", ["values", "copy"])
+def test_aupsert_aconnection(method):
+    """
+    Tests upserting natively with async connections, including concurrent upserts
+    """
+
+    async def _run_aupsert(start):
+        async with await pgbulk.aconnect() as aconnection:
+            return await pgbulk.aupsert(
+                models.TestModel,
+                [
+                    models.TestModel(int_field=i, char_field=str(i), float_field=i)
+                    for i in range(start, start + 3)
+                ],
+                ["int_field"],
+                [
+                    "char_field",
+                    pgbulk.UpdateField("float_field", expression=F("float_field") + 1),
+                ],
+                returning=True,
+                method=method,
+                aconnection=aconnection,
+            )
+
+    async def _run_aupserts():
+        return await asyncio.gather(*(_run_aupsert(start) for start in (0, 3, 6)))
+
+    results = async_to_sync(_run_aupserts)()
+    assert [len(result.created) for result in results] == [3, 3, 3]
+    assert models.TestModel.objects.count() == 9
+
+    results = async_to_sync(_run_aupsert)(0)
+    assert len(results.updated) == 3
+    assert sorted(r.float_field for r in results) == [1, 2, 3]
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("method", ["values", "copy"])
+def test_aupdate_aconnection(method):
+    """
+    Tests updating natively with an async connection
+    """
+
+    async def _run_aupdate(t_models):
+        async with await pgbulk.aconnect() as aconnection:
+            return await pgbulk.aupdate(
+                models.TestModel,
+                t_models,
+                ["int_field"],
+                returning=["id", "int_field"],
+                method=method,
+                aconnection=aconnection,
+            )
+
+    t_models = [models.TestModel.objects.create(int_field=i) for i in range(2)]
+    for t_model in t_models:
+        t_model.int_field += 1000
+
+    results = async_to_sync(_run_aupdate)(t_models)
+    assert sorted(r.int_field for r in results) == [1000, 1001]
+    assert set(models.TestModel.objects.values_list("int_field", flat=True)) == {1000, 1001}
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db
+@pytest.mark.parametrize("time_zone", ["Etc/UTC", "America/New_York"])
+def test_aconnect_time_zone(settings, time_zone):
+    """
+    Async connections use the time zone of Django's connection
+    """
+    settings.TIME_ZONE = time_zone
+
+    async def _run_aconnect():
+        async with await pgbulk.aconnect() as aconnection:
+            return aconnection.info.parameter_status("TimeZone")
+
+    assert async_to_sync(_run_aconnect)() == time_zone
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db(transaction=True)
+def test_aconnection_rollback():
+    """
+    Native async writes are rolled back on errors
+    """
+
+    async def _run_aupsert():
+        async with await pgbulk.aconnect() as aconnection:
+            await pgbulk.aupsert(
+                models.TestFuncFieldModel,
+                [
+                    models.TestFuncFieldModel(my_key="a", int_val=1),
+                    models.TestFuncFieldModel(my_key="b", int_val=None),
+                ],
+                ["my_key"],
+                batch_size=1,
+                aconnection=aconnection,
+            )
+
+    with pytest.raises(Exception, match="not-null constraint"):
+        async_to_sync(_run_aupsert)()
+
+    assert not models.TestFuncFieldModel.objects.exists()
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db
+@pytest.mark.parametrize("binary", [True, False])
+def test_acopy(binary: bool):
+    """
+    Basic test for async copy
+    """
+
+    async def _run_acopy():
+        return await pgbulk.acopy(
+            models.TestModel,
+            [
+                models.TestModel(int_field=1),
+                models.TestModel(int_field=3),
+                models.TestModel(int_field=4),
+            ],
+            binary=binary,
         )
 
     async_to_sync(_run_acopy)()
@@ -1313,6 +1979,134 @@ def test_acopy(binary: bool):
     assert set(models.TestModel.objects.values_list("int_field", flat=True)) == {1, 3, 4}
 
 
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("binary", [True, False])
+def test_acopy_aconnection(binary: bool):
+    """
+    Tests copying natively with an async connection
+    """
+
+    async def _run_acopy():
+        async with await pgbulk.aconnect() as aconnection:
+            await pgbulk.acopy(
+                models.TestModel,
+                [models.TestModel(int_field=i, char_field=str(i)) for i in range(3)],
+                binary=binary,
+                aconnection=aconnection,
+            )
+
+    async_to_sync(_run_acopy)()
+
+    assert set(models.TestModel.objects.values_list("int_field", "char_field")) == {
+        (0, "0"),
+        (1, "1"),
+        (2, "2"),
+    }
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("atomic", [True, False])
+@pytest.mark.parametrize("partition_key", [None, lambda obj: obj.int_field % 2])
+def test_parallel_copy(monkeypatch, atomic, partition_key):
+    """
+    Tests copying over multiple connections
+    """
+    monkeypatch.setattr("pgbulk.core._PARALLEL_COPY_CHUNK_SIZE", 10)
+    pgbulk.parallel_copy(
+        models.TestModel,
+        (models.TestModel(int_field=i, char_field=str(i)) for i in range(105)),
+        binary=True,
+        workers=3,
+        partition_key=partition_key,
+        atomic=atomic,
+    )
+
+    assert set(models.TestModel.objects.values_list("int_field", "char_field")) == {
+        (i, str(i)) for i in range(105)
+    }
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM pg_class WHERE relname LIKE 'pgbulk_%%'")
+        assert cursor.fetchone() == (0,)
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("atomic", [True, False])
+def test_parallel_copy_error(monkeypatch, atomic):
+    """
+    Tests errors while copying over multiple connections
+    """
+    monkeypatch.setattr("pgbulk.core._PARALLEL_COPY_CHUNK_SIZE", 10)
+    objs = [models.TestModel(int_field=i) for i in range(100)] + [models.TestModel(int_field=0)]
+    with pytest.raises(Exception, match="duplicate key"):
+        pgbulk.parallel_copy(
+            models.TestModel,
+            objs,
+            workers=2,
+            partition_key=lambda obj: obj.int_field,
+            atomic=atomic,
+        )
+
+    # The partition with the duplicate is rolled back
+    assert not models.TestModel.objects.filter(int_field__in=[0, 2, 4]).exists()
+    if atomic:
+        assert not models.TestModel.objects.exists()
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db(transaction=True)
+def test_parallel_copy_aborted(monkeypatch):
+    """
+    Tests that a failed worker aborts the other workers and stops reading the input
+    """
+    monkeypatch.setattr("pgbulk.core._PARALLEL_COPY_CHUNK_SIZE", 10)
+    read = 0
+
+    def objs():
+        nonlocal read
+        for i in range(10_000):
+            read += 1
+            yield models.TestModel(int_field="invalid" if i == 5 else i)
+
+    with pytest.raises(ValueError, match="expected a number"):
+        pgbulk.parallel_copy(models.TestModel, objs(), workers=2)
+
+    assert read < 10_000
+    assert not models.TestModel.objects.exists()
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db(transaction=True)
+def test_parallel_copy_input_error():
+    """
+    Tests errors while reading the input of a parallel copy
+    """
+
+    def objs():
+        yield from (models.TestModel(int_field=i) for i in range(10))
+        raise ValueError("Bad input")
+
+    with pytest.raises(ValueError, match="Bad input"):
+        pgbulk.parallel_copy(models.TestModel, objs(), workers=2)
+
+    assert not models.TestModel.objects.exists()
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db
+def test_parallel_copy_invalid():
+    """
+    Tests invalid arguments to a parallel copy
+    """
+    with pytest.raises(ValueError, match="workers must be a positive integer"):
+        pgbulk.parallel_copy(models.TestModel, [], workers=0)
+
+    with pytest.raises(RuntimeError, match="cannot be used in a transaction"):
+        pgbulk.parallel_copy(models.TestModel, [])
+
+
 @pytest.mark.skipif(
     DJANGO_VERSION < "5.0",
     reason="Only run on Django >= 5.0",
@@ -1443,3 +2237,1626 @@ def test_copy_with_db_defaults():
         ["int_field"],
     )
     assert models.TestDbDefaultModelWithOrmDefault.objects.get().int_field == 1
+
+
+@pytest.mark.skipif(
+    DJANGO_VERSION < "5.0",
+    reason="Only run on Django >= 5.0",
+)
+@pytest.mark.django_db
+def test_upsert_unnest_with_db_defaults():
+    """
+    Test that we cannot upsert db defaults with unnest.
+    """
+    with pytest.raises(ValueError, match='DB defaults are not supported with method="unnest"'):
+        pgbulk.upsert(
+            models.TestDbDefaultModel, [models.TestDbDefaultModel(id=1)], ["id"], method="unnest"
+        )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "method",
+    [
+        "values",
+        pytest.param(
+            "copy",
+            marks=pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3"),
+        ),
+    ],
+)
+def test_upsert_rows(method: str):
+    """
+    Tests upserting mappings, tuples, and columnar data instead of model objects
+    """
+    results = pgbulk.upsert(
+        models.TestModel,
+        [{"int_field": 1, "char_field": "1"}, {"int_field": 2, "char_field": "2"}],
+        ["int_field"],
+        ["char_field"],
+        returning=True,
+        method=method,
+    )
+    assert len(results.created) == 2
+    assert models.TestModel.objects.get(int_field=1).json_field == {}
+
+    results = pgbulk.upsert(
+        models.TestModel,
+        [(2, "two"), (3, "three")],
+        ["int_field"],
+        ["char_field"],
+        columns=["int_field", "char_field"],
+        returning=True,
+        method=method,
+    )
+    assert len(results.created) == 1
+    assert len(results.updated) == 1
+
+    pgbulk.upsert(
+        models.TestModel,
+        {"int_field": [1, 3], "char_field": ["one", None]},
+        ["int_field"],
+        ["char_field"],
+        method=method,
+    )
+    assert dict(models.TestModel.objects.values_list("int_field", "char_field")) == {
+        1: "one",
+        2: "two",
+        3: None,
+    }
+
+    # Only the columns of the rows are updated by default
+    pgbulk.upsert(
+        models.TestModel, [{"int_field": 2, "float_field": 4}], ["int_field"], method=method
+    )
+    obj = models.TestModel.objects.get(int_field=2)
+    assert (obj.char_field, obj.float_field) == ("two", 4)
+
+    # Auto fields are filled for rows
+    pgbulk.upsert(models.TestAutoDateTimeModel, [{"int_field": 1}], ["int_field"])
+    obj = models.TestAutoDateTimeModel.objects.get()
+    assert obj.auto_now_field is not None
+    assert obj.auto_now_add_field is not None
+
+    with freezegun.freeze_time("2030-01-01"):
+        pgbulk.upsert(models.TestAutoDateTimeModel, [{"int_field": 1}], ["int_field"])
+
+    updated_obj = models.TestAutoDateTimeModel.objects.get()
+    assert updated_obj.auto_now_field.year == 2030
+    assert updated_obj.auto_now_add_field == obj.auto_now_add_field
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db
+@pytest.mark.parametrize("binary", [True, False])
+def test_copy_rows(binary: bool):
+    """
+    Tests copying rows of values. Missing fields use their defaults
+    """
+    pgbulk.copy(
+        models.TestModel, [(1, "1"), (2, "2")], columns=["int_field", "char_field"], binary=binary
+    )
+    pgbulk.copy(models.TestModel, [{"int_field": 3}], exclude=["char_field"], binary=binary)
+    pgbulk.copy(models.TestModel, {"int_field": [4, 5]}, binary=binary)
+    assert dict(models.TestModel.objects.values_list("int_field", "char_field")) == {
+        1: "1",
+        2: "2",
+        3: None,
+        4: None,
+        5: None,
+    }
+    assert all(obj.json_field == {} for obj in models.TestModel.objects.all())
+
+    pgbulk.copy(models.TestFuncFieldModel, [("a", 1)], columns=["my_key", "int_val"])
+    assert models.TestFuncFieldModel.objects.get().other_int_val == 1
+
+
+@pytest.mark.django_db
+def test_update_rows():
+    """
+    Tests updating rows of values. Only the given columns are updated by default
+    """
+    objs = [
+        ddf.G(models.TestModel, int_field=1, char_field="1", float_field=1),
+        ddf.G(models.TestModel, int_field=2, char_field="2", float_field=2),
+    ]
+
+    pgbulk.update(
+        models.TestModel,
+        [(objs[0].id, "one"), (objs[1].id, "two")],
+        columns=["id", "char_field"],
+    )
+    assert list(
+        models.TestModel.objects.order_by("int_field").values_list(
+            "int_field", "char_field", "float_field"
+        )
+    ) == [(1, "one", 1), (2, "two", 2)]
+
+    pgbulk.update(
+        models.TestModel,
+        {"id": [objs[1].id], "char_field": ["2"], "float_field": [3]},
+        ["float_field"],
+    )
+    assert models.TestModel.objects.get(int_field=2).char_field == "two"
+    assert models.TestModel.objects.get(int_field=2).float_field == 3
+
+    with pytest.raises(ValueError, match="must have a primary key"), transaction.atomic():
+        pgbulk.update(models.TestModel, [{"char_field": "1"}])
+
+    with pytest.raises(ValueError, match='"float_field" is not a column'):
+        pgbulk.update(models.TestModel, [{"id": objs[0].id, "char_field": "1"}], ["float_field"])
+
+
+@pytest.mark.django_db
+def test_rows_invalid():
+    """
+    Tests invalid combinations of rows and columns
+    """
+    with (
+        pytest.raises(ValueError, match="cannot be provided with model objects"),
+        transaction.atomic(),
+    ):
+        pgbulk.upsert(
+            models.TestModel, [models.TestModel(int_field=1)], ["int_field"], columns=["int_field"]
+        )
+
+    with pytest.raises(ValueError, match="cannot be provided with mappings"), transaction.atomic():
+        pgbulk.upsert(models.TestModel, [{"int_field": 1}], ["int_field"], columns=["int_field"])
+
+    with (
+        pytest.raises(ValueError, match="cannot be provided with a mapping of columns"),
+        transaction.atomic(),
+    ):
+        pgbulk.upsert(models.TestModel, {"int_field": [1]}, ["int_field"], columns=["int_field"])
+
+    with (
+        pytest.raises(ValueError, match="must be provided with rows of values"),
+        transaction.atomic(),
+    ):
+        pgbulk.upsert(models.TestModel, [(1,)], ["int_field"])
+
+    with pytest.raises(ValueError, match="same number of values"), transaction.atomic():
+        pgbulk.upsert(models.TestModel, {"int_field": [1, 2], "char_field": ["a"]}, ["int_field"])
+
+    for row in [(1,), (1, "a", 1.0)]:
+        with pytest.raises(ValueError, match="must have 2 values"), transaction.atomic():
+            pgbulk.upsert(
+                models.TestModel,
+                [(2, "b"), row],
+                ["int_field"],
+                columns=["int_field", "char_field"],
+            )
+
+    # Empty input is a no-op
+    pgbulk.upsert(models.TestModel, {"int_field": []}, ["int_field"])
+    pgbulk.upsert(models.TestModel, [], ["int_field"], columns=["int_field"])
+    assert not models.TestModel.objects.exists()
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db
+@pytest.mark.parametrize("method", ["values", "unnest", "copy"])
+def test_upsert_stream(method, monkeypatch):
+    """
+    Tests streaming the results of an upsert
+    """
+    monkeypatch.setattr(pgbulk.core, "_STREAM_CHUNK_SIZE", 2)
+    ddf.G(models.TestFuncFieldModel, my_key="a", int_val=0)
+
+    results = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        [models.TestFuncFieldModel(my_key=key, int_val=1) for key in "abcde"],
+        ["my_key"],
+        ["int_val"],
+        returning=["my_key"],
+        stream=True,
+        batch_size=3,
+        method=method,
+    )
+    assert not isinstance(results, list)
+    assert models.TestFuncFieldModel.objects.filter(int_val=1).count() == 0
+
+    # The connection can be used while iterating
+    streamed = []
+    for row in results:
+        assert models.TestFuncFieldModel.objects.filter(my_key=row.my_key, int_val=1).exists()
+        streamed.append((row.my_key, row.status_))
+
+    assert sorted(streamed) == [
+        ("a", "u"),
+        ("b", "c"),
+        ("c", "c"),
+        ("d", "c"),
+        ("e", "c"),
+    ]
+    assert models.TestFuncFieldModel.objects.filter(int_val=1).count() == 5
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db
+def test_upsert_stream_default_batch_size(monkeypatch):
+    """
+    Tests that streamed statements are bounded when no batch size is given
+    """
+    monkeypatch.setattr(pgbulk.core, "_STREAM_BATCH_SIZE", 2)
+
+    results = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        [models.TestFuncFieldModel(my_key=key, int_val=1) for key in "abcde"],
+        ["my_key"],
+        returning=["my_key"],
+        stream=True,
+    )
+    assert next(results).my_key in "ab"
+    assert models.TestFuncFieldModel.objects.count() == 2
+    assert len(list(results)) == 4
+    assert models.TestFuncFieldModel.objects.count() == 5
+
+    results = pgbulk.update(
+        models.TestFuncFieldModel,
+        [
+            models.TestFuncFieldModel(id=obj.id, int_val=2)
+            for obj in models.TestFuncFieldModel.objects.all()
+        ],
+        ["int_val"],
+        returning=["int_val"],
+        stream=True,
+    )
+    assert next(results).int_val == 2
+    assert models.TestFuncFieldModel.objects.filter(int_val=2).count() == 2
+    assert len(list(results)) == 4
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db
+@pytest.mark.parametrize("method", ["values", "unnest", "copy"])
+def test_update_stream(method):
+    """
+    Tests streaming the results of an update
+    """
+    objs = [ddf.G(models.TestFuncFieldModel, int_val=i) for i in range(3)]
+    for obj in objs:
+        obj.int_val += 10
+
+    results = pgbulk.update(
+        models.TestFuncFieldModel,
+        objs,
+        ["int_val"],
+        returning=True,
+        stream=True,
+        batch_size=2,
+        method=method,
+    )
+    assert sorted(row.int_val for row in results) == [10, 11, 12]
+    assert sorted(models.TestFuncFieldModel.objects.values_list("int_val", flat=True)) == [
+        10,
+        11,
+        12,
+    ]
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db(transaction=True)
+def test_upsert_stream_closed():
+    """
+    Tests that closing a stream before it is exhausted rolls back the upsert
+    """
+    results = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        [models.TestFuncFieldModel(my_key=key, int_val=1) for key in "abc"],
+        ["my_key"],
+        returning=True,
+        stream=True,
+    )
+    assert next(results).int_val == 1
+    results.close()
+
+    assert not models.TestFuncFieldModel.objects.exists()
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db
+def test_stream_without_returning():
+    """
+    Tests that results can only be streamed when they are returned
+    """
+    with pytest.raises(ValueError, match="returning must be provided"):
+        pgbulk.upsert(models.TestFuncFieldModel, [], ["my_key"], stream=True)
+
+
+@pytest.mark.django_db
+def test_returning_row_types():
+    """
+    Tests that the types of returned rows are reused across calls
+    """
+    results1 = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        [models.TestFuncFieldModel(my_key="a", int_val=1)],
+        ["my_key"],
+        returning=["my_key"],
+    )
+    results2 = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        [models.TestFuncFieldModel(my_key="b", int_val=1)],
+        ["my_key"],
+        returning=["my_key"],
+    )
+    assert type(results1[0]) is type(results2[0])
+    assert results2[0].my_key == "b"
+    assert not hasattr(results2[0], "__dict__")
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("method", ["values", "unnest"])
+def test_returning_tuples(method):
+    """
+    Tests returning plain tuples from upserts and updates
+    """
+    ddf.G(models.TestFuncFieldModel, my_key="a", int_val=0)
+
+    results = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        [models.TestFuncFieldModel(my_key=key, int_val=1) for key in "ab"],
+        ["my_key"],
+        ["int_val"],
+        returning=["my_key", "int_val"],
+        returning_format="tuples",
+        method=method,
+    )
+    assert type(results[0]) is tuple
+    assert results.created == [("b", 1, "c")]
+    assert results.updated == [("a", 1, "u")]
+
+    obj = models.TestFuncFieldModel.objects.get(my_key="b")
+    obj.int_val = 2
+    results = pgbulk.update(
+        models.TestFuncFieldModel,
+        [obj],
+        ["int_val"],
+        returning=["int_val"],
+        returning_format="tuples",
+        method=method,
+    )
+    assert results == [(2,)]
+
+    if psycopg_maj_version == 3:
+        results = pgbulk.upsert(
+            models.TestFuncFieldModel,
+            [models.TestFuncFieldModel(my_key="c", int_val=1)],
+            ["my_key"],
+            returning=["my_key"],
+            returning_format="tuples",
+            stream=True,
+            method=method,
+        )
+        assert list(results) == [("c", "c")]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("method", ["values", "unnest"])
+def test_returning_columns(method):
+    """
+    Tests returning columns of values from upserts and updates
+    """
+    ddf.G(models.TestFuncFieldModel, my_key="a", int_val=0)
+
+    results = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        [models.TestFuncFieldModel(my_key=key, int_val=1) for key in "ab"],
+        ["my_key"],
+        ["int_val"],
+        returning=["my_key", "int_val"],
+        returning_format="columns",
+        batch_size=1,
+        method=method,
+    )
+    assert isinstance(results, pgbulk.UpsertColumnsResult)
+    assert results == {"my_key": ["a", "b"], "int_val": [1, 1], "status_": ["u", "c"]}
+    assert results.created == [False, True]
+    assert results.updated == [True, False]
+
+    results = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        [models.TestFuncFieldModel(my_key="a", int_val=1)],
+        ["my_key"],
+        ["int_val"],
+        returning=["my_key"],
+        ignore_unchanged=True,
+        returning_format="columns",
+        method=method,
+    )
+    assert results == {"my_key": [], "status_": []}
+
+    obj = models.TestFuncFieldModel.objects.get(my_key="b")
+    obj.int_val = 2
+    results = pgbulk.update(
+        models.TestFuncFieldModel,
+        [obj],
+        ["int_val"],
+        returning=["id", "int_val"],
+        returning_format="columns",
+        method=method,
+    )
+    assert results == {"id": [obj.id], "int_val": [2]}
+
+
+@pytest.mark.django_db
+def test_returning_numpy():
+    """
+    Tests returning NumPy arrays from upserts and updates
+    """
+    ddf.G(models.TestFuncFieldModel, my_key="a", int_val=0)
+
+    results = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        [models.TestFuncFieldModel(my_key=key, int_val=1) for key in "ab"],
+        ["my_key"],
+        ["int_val"],
+        returning=["int_val"],
+        returning_format="numpy",
+    )
+    assert isinstance(results["int_val"], np.ndarray)
+    assert results["int_val"].tolist() == [1, 1]
+    assert results.created.tolist() == [False, True]
+    assert results.updated.tolist() == [True, False]
+
+    results = pgbulk.update(
+        models.TestFuncFieldModel,
+        [
+            models.TestFuncFieldModel(id=obj.id, int_val=3)
+            for obj in models.TestFuncFieldModel.objects.all()
+        ],
+        ["int_val"],
+        returning=["int_val"],
+        returning_format="numpy",
+    )
+    assert results["int_val"].tolist() == [3, 3]
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db
+def test_stream_columns():
+    """
+    Tests that columns of values cannot be streamed
+    """
+    with pytest.raises(ValueError, match='must be "rows" or "tuples"'):
+        pgbulk.upsert(
+            models.TestFuncFieldModel,
+            [],
+            ["my_key"],
+            returning=True,
+            returning_format="columns",
+            stream=True,
+        )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "method",
+    [
+        "values",
+        "unnest",
+        pytest.param(
+            "copy",
+            marks=pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3"),
+        ),
+    ],
+)
+def test_upsert_stats(method):
+    """
+    Tests counting the created, updated, and unchanged rows of an upsert
+    """
+    ddf.G(models.TestFuncFieldModel, my_key="a", int_val=0)
+    ddf.G(models.TestFuncFieldModel, my_key="b", int_val=1)
+
+    stats = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        [models.TestFuncFieldModel(my_key=key, int_val=1) for key in "abcd"],
+        ["my_key"],
+        ["int_val"],
+        ignore_unchanged=True,
+        stats=True,
+        batch_size=3,
+        method=method,
+    )
+    assert stats == pgbulk.UpsertStats(created=2, updated=1, unchanged=1)
+    assert models.TestFuncFieldModel.objects.filter(int_val=1).count() == 4
+
+    # Conflicting rows are unchanged when there is nothing to update
+    stats = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        [models.TestFuncFieldModel(my_key=key, int_val=2) for key in "ae"],
+        ["my_key"],
+        [],
+        stats=True,
+        method=method,
+    )
+    assert stats == pgbulk.UpsertStats(created=1, updated=0, unchanged=1)
+
+    stats = pgbulk.upsert(models.TestFuncFieldModel, [], ["my_key"], stats=True, method=method)
+    assert stats == pgbulk.UpsertStats(created=0, updated=0, unchanged=0)
+
+
+@pytest.mark.django_db
+def test_upsert_stats_with_returning():
+    """
+    Tests that stats cannot be combined with returning
+    """
+    with pytest.raises(ValueError, match="stats cannot be used with returning"):
+        pgbulk.upsert(models.TestFuncFieldModel, [], ["my_key"], stats=True, returning=True)
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db(transaction=True)
+def test_aupsert_stats():
+    """
+    Tests counting the rows of a native async upsert
+    """
+
+    async def run():
+        async with await pgbulk.aconnect() as aconnection:
+            return await pgbulk.aupsert(
+                models.TestFuncFieldModel,
+                [models.TestFuncFieldModel(my_key="a", int_val=1)],
+                ["my_key"],
+                stats=True,
+                aconnection=aconnection,
+            )
+
+    assert asyncio.run(run()) == pgbulk.UpsertStats(created=1, updated=0, unchanged=0)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "method",
+    [
+        "values",
+        "unnest",
+        pytest.param(
+            "copy",
+            marks=pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3"),
+        ),
+    ],
+)
+def test_upsert_return_unchanged(method):
+    """
+    Tests returning the rows that were not changed by an upsert
+    """
+    ddf.G(models.TestFuncFieldModel, my_key="a", int_val=0)
+    ddf.G(models.TestFuncFieldModel, my_key="b", int_val=1)
+    ddf.G(models.TestFuncFieldModel, my_key="z", int_val=1)
+
+    results = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        [models.TestFuncFieldModel(my_key=key, int_val=1) for key in "abc"],
+        ["my_key"],
+        ["int_val"],
+        returning=["my_key", "int_val"],
+        ignore_unchanged=True,
+        return_unchanged=True,
+        method=method,
+    )
+    assert sorted((row.my_key, row.int_val) for row in results.created) == [("c", 1)]
+    assert sorted((row.my_key, row.int_val) for row in results.updated) == [("a", 1)]
+    assert sorted((row.my_key, row.int_val) for row in results.unchanged) == [("b", 1)]
+
+    # Conflicting rows are unchanged when there is nothing to update
+    results = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        [models.TestFuncFieldModel(my_key=key, int_val=2) for key in "ad"],
+        ["my_key"],
+        [],
+        returning=["int_val"],
+        returning_format="columns",
+        return_unchanged=True,
+        method=method,
+    )
+    assert sorted(zip(results["int_val"], results["status_"])) == [(1, "n"), (2, "c")]
+    assert results.unchanged == [status == "n" for status in results["status_"]]
+
+
+@pytest.mark.skipif(DJANGO_VERSION < "5.0", reason="Only run on Django >= 5.0")
+@pytest.mark.django_db
+def test_upsert_return_unchanged_with_db_defaults():
+    """
+    Tests that DB defaults cannot be used when returning unchanged rows
+    """
+    with pytest.raises(ValueError, match="DB defaults are not supported"):
+        pgbulk.upsert(
+            models.TestDbDefaultModel,
+            [models.TestDbDefaultModel(id=1)],
+            ["id"],
+            returning=True,
+            return_unchanged=True,
+        )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("method", ["values", "unnest"])
+def test_upsert_set_returned(method):
+    """
+    Tests setting returned values onto the upserted model objects
+    """
+    existing = ddf.G(models.TestFuncFieldModel, my_key="a", int_val=1)
+    objs = [models.TestFuncFieldModel(my_key=key, int_val=1) for key in "abc"]
+
+    results = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        objs,
+        ["my_key"],
+        ["int_val"],
+        returning=["id"],
+        set_returned=True,
+        ignore_unchanged=True,
+        return_unchanged=True,
+        method=method,
+    )
+    assert len(results) == 3
+    assert objs[0].id == existing.id
+    assert {obj.id for obj in objs} == set(
+        models.TestFuncFieldModel.objects.values_list("id", flat=True)
+    )
+    assert all(not obj._state.adding and obj._state.db == "default" for obj in objs)
+
+    # Returned values are converted like values loaded by Django
+    obj = models.TestModel(int_field=1, json_field={"a": 1})
+    pgbulk.upsert(models.TestModel, [obj], ["int_field"], returning=True, set_returned=True)
+    assert obj.id == models.TestModel.objects.get().id
+    assert obj.json_field == {"a": 1}
+
+
+@pytest.mark.django_db
+def test_upsert_set_returned_duplicates():
+    """
+    Tests that returned values are only set onto the model objects they were
+    written from when objects have duplicate or null unique fields
+    """
+    objs = [
+        models.TestFuncFieldModel(my_key="a", int_val=1),
+        models.TestFuncFieldModel(my_key="b", int_val=2),
+        models.TestFuncFieldModel(my_key="a", int_val=3),
+    ]
+    pgbulk.upsert(
+        models.TestFuncFieldModel,
+        objs,
+        ["my_key"],
+        returning=["id", "int_val"],
+        set_returned=True,
+        duplicates="last",
+    )
+    assert objs[0].id is None and objs[0]._state.adding
+    assert objs[2].id == models.TestFuncFieldModel.objects.get(my_key="a").id
+    assert objs[1].id == models.TestFuncFieldModel.objects.get(my_key="b").id
+
+    # Duplicates ignored by DO NOTHING are not returned
+    objs = [models.TestFuncFieldModel(my_key=key, int_val=4) for key in "cc"]
+    results = pgbulk.upsert(
+        models.TestFuncFieldModel, objs, ["my_key"], [], returning=True, set_returned=True
+    )
+    assert [row.index_ for row in results] == [0]
+    assert objs[0].id == models.TestFuncFieldModel.objects.get(my_key="c").id
+    assert objs[1].id is None
+
+    objs = [models.TestModel(char_field="a"), models.TestModel(char_field="b")]
+    with pytest.raises(ValueError, match="cannot be null"):
+        pgbulk.upsert(models.TestModel, objs, ["int_field"], returning=True, set_returned=True)
+
+
+@pytest.mark.django_db
+def test_upsert_set_returned_invalid():
+    """
+    Tests invalid arguments for setting returned values
+    """
+    with pytest.raises(ValueError, match="returning must be provided"):
+        pgbulk.upsert(models.TestFuncFieldModel, [], ["my_key"], set_returned=True)
+
+    with pytest.raises(ValueError, match="cannot be used with stream=True"):
+        pgbulk.upsert(
+            models.TestFuncFieldModel,
+            [],
+            ["my_key"],
+            returning=True,
+            set_returned=True,
+            stream=True,
+        )
+
+    with pytest.raises(ValueError, match="only be used with model objects"):
+        pgbulk.upsert(
+            models.TestFuncFieldModel,
+            [{"my_key": "a", "int_val": 1}],
+            ["my_key"],
+            returning=True,
+            set_returned=True,
+        )
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db
+@pytest.mark.parametrize("binary", [True, False])
+def test_copy_set_pks(binary, monkeypatch):
+    """
+    Tests allocating primary keys for copied model objects
+    """
+    monkeypatch.setattr(pgbulk.core, "_SET_PKS_WINDOW_SIZE", 2)
+    objs = [models.TestModel(int_field=i) for i in range(3)]
+    objs.extend([models.TestModel(id=1000, int_field=3), models.TestModel(id=1001, int_field=5)])
+
+    pgbulk.copy(models.TestModel, objs, binary=binary, set_pks=True)
+    assert all(obj.id is not None and not obj._state.adding for obj in objs)
+    assert dict(models.TestModel.objects.values_list("int_field", "id")) == {
+        obj.int_field: obj.id for obj in objs
+    }
+
+    # New objects are not assigned the same keys
+    obj = models.TestModel(int_field=4)
+    pgbulk.upsert(models.TestModel, [obj], ["int_field"], returning=["id"], set_returned=True)
+    assert obj.id not in {obj.id for obj in objs}
+
+    with pytest.raises(ValueError, match="only be used with model objects"), transaction.atomic():
+        pgbulk.copy(models.TestModel, [{"int_field": 5}], set_pks=True)
+
+    with pytest.raises(ValueError, match="requires a primary key with a sequence"):
+        pgbulk.copy(models.TestPkChar, [models.TestPkChar(my_key=None)], set_pks=True)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "method",
+    [
+        "values",
+        "unnest",
+        pytest.param(
+            "copy",
+            marks=pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3"),
+        ),
+    ],
+)
+def test_upsert_duplicates(method):
+    """
+    Tests collapsing model objects with the same unique fields
+    """
+    objs = [
+        models.TestFuncFieldModel(my_key="a", int_val=1),
+        models.TestFuncFieldModel(my_key="b", int_val=2),
+        models.TestFuncFieldModel(my_key="a", int_val=3),
+        models.TestFuncFieldModel(my_key="a", int_val=4),
+    ]
+    with (
+        pytest.raises(ProgrammingError, match="cannot affect row a second time"),
+        transaction.atomic(),
+    ):
+        pgbulk.upsert(models.TestFuncFieldModel, objs, ["my_key"], method=method)
+
+    with pytest.raises(ValueError, match="Invalid duplicates"), transaction.atomic():
+        pgbulk.upsert(models.TestFuncFieldModel, objs, ["my_key"], duplicates="all")
+
+    results = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        objs,
+        ["my_key"],
+        returning=["int_val"],
+        duplicates="first",
+        method=method,
+    )
+    assert sorted(row.int_val for row in results) == [1, 2]
+
+    results = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        objs,
+        ["my_key"],
+        returning=["int_val"],
+        ordered=True,
+        duplicates="last",
+        method=method,
+    )
+    assert [(row.int_val, row.index_, row.status_) for row in results] == [
+        (2, 1, "u"),
+        (4, 3, "u"),
+    ]
+
+    # Merged objects keep the position of the first object
+    results = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        objs,
+        ["my_key"],
+        returning=["int_val"],
+        ordered=True,
+        duplicates=lambda obj, duplicate: models.TestFuncFieldModel(
+            my_key=obj.my_key, int_val=obj.int_val + duplicate.int_val
+        ),
+        method=method,
+    )
+    assert [(row.int_val, row.index_) for row in results] == [(8, 0), (2, 1)]
+
+    # Objects are collapsed across windows
+    results = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        objs,
+        ["my_key"],
+        returning=["my_key", "int_val"],
+        duplicates="first",
+        window_size=2,
+        method=method,
+    )
+    assert sorted((row.my_key, row.int_val) for row in results) == [("a", 1), ("b", 2)]
+
+    # Rows of values are merged as they were given
+    results = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        [
+            {"my_key": "c", "int_val": 1},
+            {"my_key": "d", "int_val": 2},
+            {"my_key": "c", "int_val": 3},
+        ],
+        ["my_key"],
+        returning=["my_key", "int_val"],
+        duplicates=lambda row, duplicate: {
+            **row,
+            "int_val": row["int_val"] + duplicate["int_val"],
+        },
+        window_size=1,
+        method=method,
+    )
+    assert sorted((row.my_key, row.int_val) for row in results) == [("c", 4), ("d", 2)]
+
+    # Objects with null unique fields do not conflict and are not collapsed
+    stats = pgbulk.upsert(
+        models.TestModel,
+        [models.TestModel(char_field="a"), models.TestModel(char_field="a")],
+        ["int_field", "char_field"],
+        stats=True,
+        duplicates="last",
+    )
+    assert stats == pgbulk.UpsertStats(created=2, updated=0, unchanged=0)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "method",
+    [
+        "values",
+        "unnest",
+        pytest.param(
+            "copy",
+            marks=pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3"),
+        ),
+    ],
+)
+def test_upsert_ordered(method):
+    """
+    Tests returning upserted rows in the order of the model objects
+    """
+    ddf.G(models.TestFuncFieldModel, my_key="b", int_val=0)
+    ddf.G(models.TestFuncFieldModel, my_key="d", int_val=1)
+    keys = ["e", "b", "a", "d", "c"]
+
+    results = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        [models.TestFuncFieldModel(my_key=key, int_val=1) for key in keys],
+        ["my_key"],
+        ["int_val"],
+        returning=["my_key"],
+        ordered=True,
+        batch_size=2,
+        window_size=3,
+        method=method,
+    )
+    assert [(row.my_key, row.index_, row.status_) for row in results] == [
+        ("e", 0, "c"),
+        ("b", 1, "u"),
+        ("a", 2, "c"),
+        ("d", 3, "u"),
+        ("c", 4, "c"),
+    ]
+
+    # Unchanged rows are returned in their place
+    results = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        [models.TestFuncFieldModel(my_key=key, int_val=2 if key == "a" else 1) for key in keys],
+        ["my_key"],
+        ["int_val"],
+        returning=["my_key"],
+        returning_format="columns",
+        ignore_unchanged=True,
+        return_unchanged=True,
+        ordered=True,
+        method=method,
+    )
+    assert results["my_key"] == keys
+    assert results["index_"] == [0, 1, 2, 3, 4]
+    assert results["status_"] == ["n", "n", "u", "n", "n"]
+
+    # Inserted rows are returned once for the first of their duplicate objects
+    results = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        [models.TestFuncFieldModel(my_key=key, int_val=1) for key in ["g", "f", "g"]],
+        ["my_key"],
+        [],
+        returning=["my_key"],
+        ordered=True,
+        method=method,
+    )
+    assert [(row.my_key, row.index_, row.status_) for row in results] == [
+        ("g", 0, "c"),
+        ("f", 1, "c"),
+    ]
+
+
+@pytest.mark.django_db
+def test_upsert_ordered_null_unique_fields():
+    """
+    Tests that rows with null unique fields cannot be returned in input order
+    """
+    objs = [models.TestModel(int_field=1, char_field="a"), models.TestModel(char_field="b")]
+    for presorted in [True, False]:
+        with pytest.raises(ValueError, match="cannot be null"), transaction.atomic():
+            pgbulk.upsert(
+                models.TestModel,
+                objs,
+                ["int_field"],
+                returning=["char_field"],
+                ordered=True,
+                presorted=presorted,
+            )
+
+    assert not models.TestModel.objects.exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "method",
+    [
+        "values",
+        "unnest",
+        pytest.param(
+            "copy",
+            marks=pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3"),
+        ),
+    ],
+)
+def test_update_ordered(method):
+    """
+    Tests returning updated rows in the order of the model objects
+    """
+    objs = [ddf.G(models.TestFuncFieldModel, int_val=i) for i in range(4)]
+    objs = [objs[2], objs[0], objs[3], objs[1]]
+    for obj in objs:
+        obj.int_val += 10
+
+    results = pgbulk.update(
+        models.TestFuncFieldModel,
+        objs,
+        ["int_val"],
+        returning=["id", "int_val"],
+        ordered=True,
+        batch_size=2,
+        window_size=3,
+        method=method,
+    )
+    assert [(row.id, row.int_val, row.index_) for row in results] == [
+        (obj.id, obj.int_val, i) for i, obj in enumerate(objs)
+    ]
+
+
+@pytest.mark.django_db
+def test_ordered_invalid():
+    """
+    Tests that rows can only be ordered when they are returned
+    """
+    with pytest.raises(ValueError, match="returning must be provided"):
+        pgbulk.upsert(models.TestFuncFieldModel, [], ["my_key"], ordered=True)
+
+    with pytest.raises(ValueError, match="returning must be provided"):
+        pgbulk.update(models.TestFuncFieldModel, [], ["int_val"], ordered=True)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("presorted", [True, False])
+def test_rows_prepared_once(presorted, monkeypatch):
+    """
+    Tests that the values of rows are prepared once for sorting and writing,
+    and that presorted rows are written in their given order
+    """
+    num_prepared = 0
+    get_field_db_val = pgbulk.core._get_field_db_val
+
+    def counting_get_field_db_val(*args, **kwargs):
+        nonlocal num_prepared
+        num_prepared += 1
+        return get_field_db_val(*args, **kwargs)
+
+    monkeypatch.setattr(pgbulk.core, "_get_field_db_val", counting_get_field_db_val)
+    time_zones = ["UTC", "America/New_York", "Europe/London"]
+    objs = [
+        models.TestUniqueTzModel(time_zone=time_zone, int_field=i)
+        for i, time_zone in enumerate(time_zones)
+    ]
+
+    results = pgbulk.upsert(
+        models.TestUniqueTzModel,
+        objs,
+        ["time_zone"],
+        returning=["time_zone"],
+        presorted=presorted,
+    )
+    # Only the time zone field is prepared without a fast conversion
+    assert num_prepared == len(objs)
+    assert [str(row.time_zone) for row in results] == (
+        time_zones if presorted else sorted(time_zones)
+    )
+
+    objs = list(models.TestUniqueTzModel.objects.order_by("-id"))
+    for obj in objs:
+        obj.float_field = 1.0
+
+    results = pgbulk.update(
+        models.TestUniqueTzModel, objs, ["float_field"], returning=["id"], presorted=presorted
+    )
+    assert sorted(row.id for row in results) == sorted(obj.id for obj in objs)
+    assert set(models.TestUniqueTzModel.objects.values_list("float_field", flat=True)) == {1.0}
+
+
+@pytest.mark.django_db
+def test_expression_values(monkeypatch):
+    """
+    Tests writing expressions as the values of model objects. Rows are only
+    checked for expressions when they were found during extraction
+    """
+    get_expression_renderer = pgbulk.core._get_expression_renderer
+    setups = []
+    calls = []
+
+    def tracking_get_expression_renderer(queryset, cursor):
+        setups.append(queryset.model)
+        render_expressions = get_expression_renderer(queryset, cursor)
+
+        def tracking_render_expressions(rows, positions):
+            calls.append(set(positions))
+            render_expressions(rows, positions)
+
+        return tracking_render_expressions
+
+    monkeypatch.setattr(pgbulk.core, "_get_expression_renderer", tracking_get_expression_renderer)
+    pgbulk.upsert(models.TestModel, [models.TestModel(int_field=1)], ["int_field"])
+    assert not setups
+
+    # Expressions are rendered for every batch with a renderer that is set up once
+    pgbulk.upsert(
+        models.TestModel,
+        [
+            models.TestModel(int_field=2),
+            models.TestModel(int_field=3, char_field=Lower(Value("A"))),
+            models.TestModel(int_field=4, char_field=Upper(Value("c"))),
+        ],
+        ["int_field"],
+        ["char_field"],
+        batch_size=2,
+    )
+    obj = models.TestModel.objects.get(int_field=3)
+    assert obj.char_field == "a"
+    assert models.TestModel.objects.get(int_field=4).char_field == "C"
+    assert len(setups) == 1
+    assert len(calls) == 2
+
+    obj.char_field = Upper(Value("b"))
+    pgbulk.update(models.TestModel, [obj], ["char_field"])
+    assert models.TestModel.objects.get(int_field=3).char_field == "B"
+    assert len(setups) == 2
+    assert len(calls) == 3
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "method",
+    [
+        "unnest",
+        pytest.param(
+            "copy",
+            marks=pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3"),
+        ),
+    ],
+)
+def test_expression_values_invalid_method(method):
+    """
+    Tests that expressions can only be written with the values method
+    """
+    obj = models.TestPkChar(my_key="a", char_field=Upper(Value("a")))
+    with pytest.raises(ValueError, match="only supported with method"), transaction.atomic():
+        pgbulk.upsert(models.TestPkChar, [obj], ["my_key"], method=method)
+
+    ddf.G(models.TestPkChar, my_key="a")
+    with pytest.raises(ValueError, match="only supported with method"), transaction.atomic():
+        pgbulk.update(models.TestPkChar, [obj], ["char_field"], method=method)
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db
+@pytest.mark.parametrize("method", ["values", "unnest", "copy"])
+def test_prepare(method, monkeypatch):
+    """
+    Tests preparing the statements of upserts and updates on the server
+    """
+    with pytest.raises(ImproperlyConfigured, match="prepare_threshold"), transaction.atomic():
+        pgbulk.upsert(models.TestFuncFieldModel, [], ["my_key"], prepare=True)
+
+    monkeypatch.setattr(connection.connection, "prepare_threshold", 5)
+
+    def num_prepared():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM pg_prepared_statements")
+            return cursor.fetchone()[0]
+
+    num_before = num_prepared()
+    for start in (0, 7):
+        results = pgbulk.upsert(
+            models.TestFuncFieldModel,
+            [models.TestFuncFieldModel(my_key=str(i), int_val=i) for i in range(start, start + 7)],
+            ["my_key"],
+            ["int_val"],
+            returning=["my_key", "int_val"],
+            prepare=True,
+            method=method,
+        )
+        assert sorted((row.my_key, row.int_val) for row in results) == sorted(
+            (str(i), i) for i in range(start, start + 7)
+        )
+
+    # Batches of values are split into 4, 2, and 1 rows, which are prepared once
+    assert num_prepared() - num_before == {"values": 3, "unnest": 1, "copy": 0}[method]
+
+    objs = list(models.TestFuncFieldModel.objects.all())
+    for obj in objs:
+        obj.int_val += 100
+
+    results = pgbulk.update(
+        models.TestFuncFieldModel,
+        objs,
+        ["int_val"],
+        returning=["int_val"],
+        prepare=True,
+        method=method,
+    )
+    assert sorted(row.int_val for row in results) == list(range(100, 114))
+    assert sorted(models.TestFuncFieldModel.objects.values_list("int_val", flat=True)) == list(
+        range(100, 114)
+    )
+
+    pgbulk.update(models.TestFuncFieldModel, objs, ["int_val"], prepare=True, method=method)
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db(transaction=True)
+def test_prepare_aconnection(monkeypatch):
+    """
+    Tests preparing statements of writes on an async connection
+    """
+    monkeypatch.setitem(connection.settings_dict["OPTIONS"], "prepare_threshold", 5)
+
+    async def _run_aupsert():
+        async with await pgbulk.aconnect() as aconnection:
+            return await pgbulk.aupsert(
+                models.TestFuncFieldModel,
+                [models.TestFuncFieldModel(my_key=str(i), int_val=i) for i in range(3)],
+                ["my_key"],
+                ["int_val"],
+                returning=["int_val"],
+                prepare=True,
+                aconnection=aconnection,
+            )
+
+    results = async_to_sync(_run_aupsert)()
+    assert sorted(row.int_val for row in results) == [0, 1, 2]
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db
+@pytest.mark.parametrize("method", ["values", "unnest"])
+@pytest.mark.parametrize("prepare", [True, False])
+def test_pipeline(method, prepare, monkeypatch):
+    """
+    Tests sending the statements of every batch of a window together in pipeline mode
+    """
+    monkeypatch.setattr(connection.connection, "prepare_threshold", 5)
+    run_pipeline = pgbulk.core._run_pipeline
+    pipelines = []
+
+    def tracking_run_pipeline(op, cursor):
+        pipelines.append(len(op.statements))
+        return run_pipeline(op, cursor)
+
+    monkeypatch.setattr(pgbulk.core, "_run_pipeline", tracking_run_pipeline)
+    objs = [models.TestFuncFieldModel(my_key=str(i), int_val=i) for i in range(7)]
+
+    results = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        objs,
+        ["my_key"],
+        ["int_val"],
+        returning=["my_key"],
+        ordered=True,
+        batch_size=2,
+        window_size=5,
+        pipeline=True,
+        prepare=prepare,
+        method=method,
+    )
+    assert [row.my_key for row in results] == [str(i) for i in range(7)]
+    assert pipelines == [3, 1]
+
+    stats = pgbulk.upsert(
+        models.TestFuncFieldModel,
+        objs,
+        ["my_key"],
+        ["int_val"],
+        ignore_unchanged=True,
+        stats=True,
+        batch_size=2,
+        pipeline=True,
+        prepare=prepare,
+        method=method,
+    )
+    assert stats == (0, 0, 7)
+
+    objs = list(models.TestFuncFieldModel.objects.order_by("id"))
+    for obj in objs:
+        obj.int_val += 10
+
+    pgbulk.update(
+        models.TestFuncFieldModel,
+        objs,
+        ["int_val"],
+        batch_size=3,
+        pipeline=True,
+        prepare=prepare,
+        method=method,
+    )
+    assert list(
+        models.TestFuncFieldModel.objects.order_by("id").values_list("int_val", flat=True)
+    ) == list(range(10, 17))
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db
+def test_pipeline_expression_values():
+    """
+    Tests pipelining statements with expressions in the values of rows
+    """
+    objs = [models.TestModel(int_field=i, char_field=Lower(Value(f"A{i}"))) for i in range(3)]
+    results = pgbulk.upsert(
+        models.TestModel,
+        objs,
+        ["int_field"],
+        returning=["char_field"],
+        batch_size=2,
+        pipeline=True,
+    )
+    assert sorted(row.char_field for row in results) == ["a0", "a1", "a2"]
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("prepare", [True, False])
+def test_pipeline_aconnection(prepare, monkeypatch):
+    """
+    Tests pipelining the statements of writes on an async connection
+    """
+    monkeypatch.setitem(connection.settings_dict["OPTIONS"], "prepare_threshold", 5)
+
+    async def _run_writes():
+        async with await pgbulk.aconnect() as aconnection:
+            upserted = await pgbulk.aupsert(
+                models.TestFuncFieldModel,
+                [models.TestFuncFieldModel(my_key=str(i), int_val=i) for i in range(3)],
+                ["my_key"],
+                ["int_val"],
+                returning=["id", "int_val"],
+                batch_size=2,
+                pipeline=True,
+                prepare=prepare,
+                aconnection=aconnection,
+            )
+            await pgbulk.aupdate(
+                models.TestFuncFieldModel,
+                [
+                    models.TestFuncFieldModel(id=row.id, int_val=row.int_val + 10)
+                    for row in upserted
+                ],
+                ["int_val"],
+                batch_size=2,
+                pipeline=True,
+                prepare=prepare,
+                aconnection=aconnection,
+            )
+            return upserted
+
+    results = async_to_sync(_run_writes)()
+    assert sorted(row.int_val for row in results) == [0, 1, 2]
+    assert sorted(models.TestFuncFieldModel.objects.values_list("int_val", flat=True)) == [
+        10,
+        11,
+        12,
+    ]
+
+
+@pytest.mark.django_db
+def test_bulk_writer(monkeypatch):
+    """
+    Tests buffering model objects and upserting them when a limit is reached
+    """
+    now = 0.0
+    monkeypatch.setattr(pgbulk.core.time, "monotonic", lambda: now)
+
+    with pgbulk.BulkWriter(
+        models.TestFuncFieldModel, ["my_key"], ["int_val"], max_rows=3
+    ) as writer:
+        writer.add(models.TestFuncFieldModel(my_key="a", int_val=1))
+        writer.add(models.TestFuncFieldModel(my_key="a", int_val=2))
+        writer.add(models.TestFuncFieldModel(my_key="b", int_val=1))
+        # Objects with the same unique fields are deduplicated
+        assert len(writer) == 2
+        assert not models.TestFuncFieldModel.objects.exists()
+
+        writer.add(models.TestFuncFieldModel(my_key="c", int_val=1))
+        assert len(writer) == 0
+        assert writer.num_written == 3
+
+        writer.add(models.TestFuncFieldModel(my_key="d", int_val=1))
+
+    assert writer.num_written == 4
+    assert dict(models.TestFuncFieldModel.objects.values_list("my_key", "int_val")) == {
+        "a": 2,
+        "b": 1,
+        "c": 1,
+        "d": 1,
+    }
+
+    # Objects are written when they are too old or too large
+    writer = pgbulk.BulkWriter(
+        models.TestFuncFieldModel, ["my_key"], max_rows=None, max_bytes=10, max_age=5
+    )
+    writer.add(models.TestFuncFieldModel(my_key="a", int_val=3))
+    now = 4.0
+    writer.add(models.TestFuncFieldModel(my_key="b", int_val=3))
+    assert len(writer) == 2
+
+    now = 5.0
+    writer.add(models.TestFuncFieldModel(my_key="c", int_val=3))
+    assert len(writer) == 0
+
+    writer.add(models.TestFuncFieldModel(my_key="d", int_val=3))
+    writer.add(models.TestFuncFieldModel(my_key="d", int_val=4))
+    assert len(writer) == 1
+    writer.add(models.TestFuncFieldModel(my_key="long" * 3, int_val=3))
+    assert len(writer) == 0
+    assert writer.num_written == 5
+    assert set(models.TestFuncFieldModel.objects.values_list("int_val", flat=True)) == {3, 4}
+
+
+@pytest.mark.skipif(psycopg_maj_version == 2, reason="Only run on psycopg3")
+@pytest.mark.django_db
+def test_bulk_writer_copy():
+    """
+    Tests buffering model objects and copying them, which are not deduplicated
+    """
+    with pytest.raises(RuntimeError, match="error"):
+        with pgbulk.BulkWriter(models.TestModel) as writer:
+            writer.add(models.TestModel(int_field=1))
+            raise RuntimeError("error")
+
+    # Objects are not written after an error
+    assert not models.TestModel.objects.exists()
+
+    with pgbulk.BulkWriter(models.TestModel, max_rows=2, binary=True) as writer:
+        for i in range(3):
+            writer.add(models.TestModel(int_field=i, char_field="a"))
+
+        writer.flush()
+        writer.flush()
+
+    assert writer.num_written == 3
+    assert sorted(models.TestModel.objects.values_list("int_field", flat=True)) == [0, 1, 2]
+
+
+def test_bulk_writer_invalid():
+    """
+    Tests invalid arguments for bulk writers
+    """
+    with pytest.raises(ValueError, match="only be provided with unique_fields"):
+        pgbulk.BulkWriter(models.TestModel, update_fields=["char_field"])
+
+    for kwargs in [{"max_rows": 0}, {"max_bytes": 0}, {"max_age": 0}]:
+        with pytest.raises(ValueError, match="must be a positive"):
+            pgbulk.BulkWriter(models.TestModel, **kwargs)
+
+    # Arguments for upserts and copies are checked when the writer is created
+    with pytest.raises(TypeError, match="Invalid argument for pgbulk.upsert"):
+        pgbulk.BulkWriter(models.TestModel, ["int_field"], bogus=1)
+
+    with pytest.raises(TypeError, match="Invalid argument for pgbulk.copy"):
+        pgbulk.BulkWriter(models.TestModel, ignore_unchanged=True)
+
+    with pytest.raises(TypeError, match="model_objs"):
+        pgbulk.BulkWriter(models.TestModel, ["int_field"], model_objs=[])
+
+    for kwargs in [{"returning": True}, {"stats": True}, {"stream": True}]:
+        with pytest.raises(ValueError, match="cannot be used with a bulk writer"):
+            pgbulk.BulkWriter(models.TestModel, ["int_field"], **kwargs)
+
+    with pytest.raises(TypeError, match="Invalid argument"):
+        pgbulk.BackgroundBulkWriter(models.TestModel, ["int_field"], bogus=1)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_background_bulk_writer():
+    """
+    Tests writing model objects added from multiple threads in a background thread
+    """
+    with pgbulk.BackgroundBulkWriter(
+        models.TestFuncFieldModel, ["my_key"], ["int_val"], max_rows=3
+    ) as writer:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            for i in range(10):
+                executor.submit(writer.add, models.TestFuncFieldModel(my_key=str(i), int_val=i))
+
+        writer.flush()
+        assert len(writer) == 0
+        assert writer.num_written == 10
+        assert models.TestFuncFieldModel.objects.count() == 10
+
+        writer.add(models.TestFuncFieldModel(my_key="0", int_val=10))
+
+    assert models.TestFuncFieldModel.objects.get(my_key="0").int_val == 10
+    with pytest.raises(RuntimeError, match="closed"):
+        writer.add(models.TestFuncFieldModel(my_key="1"))
+
+    with pytest.raises(RuntimeError, match="closed"):
+        writer.flush()
+
+    writer.close()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_background_bulk_writer_max_age(monkeypatch):
+    """
+    Tests that the background thread writes objects once they are too old
+    """
+    written = threading.Event()
+    upsert = pgbulk.core.upsert
+
+    def tracking_upsert(*args, **kwargs):
+        upsert(*args, **kwargs)
+        written.set()
+
+    monkeypatch.setattr(pgbulk.core, "upsert", tracking_upsert)
+    writer = pgbulk.BackgroundBulkWriter(models.TestFuncFieldModel, ["my_key"], max_age=0.01)
+    writer.add(models.TestFuncFieldModel(my_key="a", int_val=0))
+    assert written.wait(timeout=5)
+    assert models.TestFuncFieldModel.objects.exists()
+    writer.close()
+    assert writer.num_written == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_background_bulk_writer_backpressure(monkeypatch):
+    """
+    Tests dropping objects when the queue of a background writer is full,
+    and raising errors of the background thread
+    """
+    writing = threading.Event()
+    release = threading.Event()
+    upsert = pgbulk.core.upsert
+
+    def blocking_upsert(*args, **kwargs):
+        writing.set()
+        release.wait()
+        if kwargs.get("ignore_unchanged"):
+            raise ValueError("error")
+
+        return upsert(*args, **kwargs)
+
+    monkeypatch.setattr(pgbulk.core, "upsert", blocking_upsert)
+    writer = pgbulk.BackgroundBulkWriter(
+        models.TestFuncFieldModel, ["my_key"], queue_size=1, drop=True, max_rows=1
+    )
+    writer.add(models.TestFuncFieldModel(my_key="a", int_val=0))
+    writing.wait()
+    writer.add(models.TestFuncFieldModel(my_key="b", int_val=0))
+    writer.add(models.TestFuncFieldModel(my_key="c", int_val=0))
+    assert writer.num_dropped == 1
+
+    release.set()
+    writer.close()
+    assert sorted(models.TestFuncFieldModel.objects.values_list("my_key", flat=True)) == [
+        "a",
+        "b",
+    ]
+
+    writer = pgbulk.BackgroundBulkWriter(
+        models.TestFuncFieldModel, ["my_key"], ignore_unchanged=True
+    )
+    writer.add(models.TestFuncFieldModel(my_key="d", int_val=0))
+    with pytest.raises(ValueError, match="error"):
+        writer.flush()
+
+    with pytest.raises(ValueError, match="error"):
+        writer.add(models.TestFuncFieldModel(my_key="e", int_val=0))
+
+    with pytest.raises(ValueError, match="error"):
+        writer.close()
+
+    with pytest.raises(ValueError, match="queue_size must be a positive integer"):
+        pgbulk.BackgroundBulkWriter(models.TestFuncFieldModel, queue_size=0)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_background_bulk_writer_close_while_adding():
+    """
+    Tests that objects added while a background writer closes are either
+    written or rejected
+    """
+    writer = pgbulk.BackgroundBulkWriter(models.TestFuncFieldModel, ["my_key"])
+    added = []
+
+    def add(i):
+        try:
+            writer.add(models.TestFuncFieldModel(my_key=str(i), int_val=i))
+            added.append(i)
+        except RuntimeError:
+            pass
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for i in range(200):
+            executor.submit(add, i)
+
+        writer.close()
+
+    assert models.TestFuncFieldModel.objects.count() == len(added)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_background_bulk_writer_stopped(monkeypatch):
+    """
+    Tests that callers do not wait on the thread of a background writer after
+    it stops from an error that is not raised by a write
+    """
+
+    class Stop(BaseException):
+        pass
+
+    writing = threading.Event()
+    release = threading.Event()
+
+    def stopping_upsert(*args, **kwargs):
+        writing.set()
+        release.wait()
+        raise Stop()
+
+    monkeypatch.setattr(pgbulk.core, "upsert", stopping_upsert)
+    monkeypatch.setattr(pgbulk.core, "_BACKGROUND_POLL_INTERVAL", 0.01)
+
+    # Flushing waits until the thread stops and raises its error
+    writer = pgbulk.BackgroundBulkWriter(models.TestFuncFieldModel, ["my_key"], max_rows=1)
+    writer.add(models.TestFuncFieldModel(my_key="a", int_val=0))
+    writing.wait()
+    threading.Timer(0.1, release.set).start()
+    with pytest.raises(Stop):
+        writer.flush()
+
+    with pytest.raises(Stop):
+        writer.close()
+
+    # Adding to a full queue waits until the thread stops and raises its error
+    writing.clear()
+    release.clear()
+    writer = pgbulk.BackgroundBulkWriter(
+        models.TestFuncFieldModel, ["my_key"], queue_size=1, max_rows=1
+    )
+    writer.add(models.TestFuncFieldModel(my_key="a", int_val=0))
+    writing.wait()
+    writer.add(models.TestFuncFieldModel(my_key="b", int_val=0))
+    threading.Timer(0.1, release.set).start()
+    with pytest.raises(Stop):
+        writer.add(models.TestFuncFieldModel(my_key="c", int_val=0))
+
+    with pytest.raises(Stop):
+        writer.close()